@@ -1,11 +1,16 @@
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.responses import JSONResponse
-from ocr.recognition import Recognize
+from ocr.workers import RecognitionPool
 import traceback
 
 app = FastAPI(title="Visiting Card OCR API")
 
-recognizer = Recognize()
+# recognition runs in worker processes, each with its own Recognize instance
+pool = RecognitionPool()
+
+@app.on_event("shutdown")
+def shutdown():
+    pool.shutdown()
 
 @app.get("/health")
 def health():
@@ -17,7 +22,7 @@ async def extract(file: UploadFile = File(...), lang: str = Form("eng")):
         image_bytes = await file.read()
         if not image_bytes:
             return JSONResponse({"detail": "provide file"}, status_code=400)
-        result = recognizer.extract(image_bytes, lang=lang)
+        result = await pool.extract(image_bytes, lang=lang)
         return JSONResponse(result)
     except Exception as e:
         return JSONResponse(
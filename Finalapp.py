@@ -1,122 +1,279 @@
 from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import JSONResponse
-from ocr.recognition import Recognize
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from ocr.workers import RecognitionPool
+from ocr.jobs import JobQueue, DONE, FAILED
+from ocr.cache import ResultCache
+from ocr.singleflight import SingleFlight
+from ocr.admission import AdmissionController, Overloaded
+from ocr.fields import parse_fields, needs_text
+from ocr import async_driver
+from ocr.serializer import dumps
+from ocr import metrics
+from ocr.config import (OCR_JOB_POLL_INTERVAL, OCR_REQUEST_TIMEOUT, OCR_MAX_CONCURRENT, OCR_MAX_QUEUE,
+                        OCR_ENGINE_TIMEOUT)
 import traceback
-import math
-import json
-from decimal import Decimal
-import numpy as np
-import pandas as pd
+import asyncio
+import time
+from typing import List
 
-def _is_non_finite_val(v):
-    try:
-        # pandas.isna handles pd.NA, NaT and numpy NaN nicely
-        if pd.isna(v):
-            return True
-    except Exception:
-        pass
-    # numpy scalar
-    if isinstance(v, np.generic):
-        try:
-            v = v.item()
-        except Exception:
-            pass
-    # floats / decimals / inf/nan
-    try:
-        fv = float(v)
-        if not math.isfinite(fv):
-            return True
-    except Exception:
-        pass
-    return False
-
-def sanitize(obj):
-    # missing / NaN / NA / Inf -> None
-    try:
-        if _is_non_finite_val(obj):
-            return None
-    except Exception:
-        pass
+class SafeJSONResponse(JSONResponse):
+    """JSONResponse that encodes with the single-pass sanitizing serializer."""
 
-    # dict
-    if isinstance(obj, dict):
-        return {k: sanitize(v) for k, v in obj.items()}
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
 
-    # list/tuple
-    if isinstance(obj, (list, tuple, set)):
-        return [sanitize(v) for v in obj]
+app = FastAPI(title="Visiting Card OCR API")
 
-    # numpy array -> list
-    if isinstance(obj, np.ndarray):
-        try:
-            return sanitize(obj.tolist())
-        except Exception:
-            return None
+# recognition runs in worker processes, each with its own Recognize instance
+pool = RecognitionPool()
 
-    # numpy scalar
-    if isinstance(obj, np.generic):
-        try:
-            return sanitize(obj.item())
-        except Exception:
-            return None
+# content-addressed result cache in front of the pool; identical requests
+# already in flight share one computation instead of running tesseract again
+cache = ResultCache()
+flights = SingleFlight()
+# caps concurrent recognitions; excess requests beyond the wait queue get a 429
+admission = AdmissionController(OCR_MAX_CONCURRENT, OCR_MAX_QUEUE)
 
-    # pandas types
-    try:
-        if isinstance(obj, (pd.Timestamp, pd.Timedelta)):
-            return str(obj)
-    except Exception:
-        pass
+def _busy(e: Overloaded):
+    return JSONResponse({"detail": "server busy"}, status_code=429, headers={"Retry-After": str(e.retry_after)})
 
-    # Decimal
-    if isinstance(obj, Decimal):
-        try:
-            f = float(obj)
-            return None if not math.isfinite(f) else f
-        except Exception:
-            return str(obj)
+async def _recognize_async_engine(image_bytes, lang, fields, include_raw):
+    """
+    Preprocess and build the result in the pool, but run tesseract from here as
+    asyncio subprocesses: they are killed when OCR_ENGINE_TIMEOUT passes or when
+    this task is cancelled, so a stuck card does not hold a worker.
+    """
+    deadline = time.monotonic() + OCR_ENGINE_TIMEOUT if OCR_ENGINE_TIMEOUT else None
+    pre = await pool.run("prepare", image_bytes)
+    with metrics.stage("run_tesseract_data"):
+        analysis = await async_driver.analyze(pre, lang=lang, deadline=deadline, fields=fields)
+    return await pool.recognize(image_bytes, lang=lang, fields=fields, include_raw=include_raw, analysis=analysis)
 
-    # bytes
-    if isinstance(obj, (bytes, bytearray)):
-        try:
-            return obj.decode("utf-8", "replace")
-        except Exception:
-            return repr(obj)
+async def _recognize(image_bytes, lang, timeout=None, bounded=True, fields=None, include_raw=False):
+    """
+    Cached, coalesced, admission-controlled recognition: returns the encoded
+    JSON body for these bytes + lang (+ field projection). Raises Overloaded
+    when bounded and the wait queue is full.
+    """
+    key = cache.key(image_bytes, method="recognize", lang=lang,
+                    fields=sorted(fields) if fields is not None else None, include_raw=include_raw)
+    # memory first; the disk tier is read off the event loop
+    hit = cache.peek(key)
+    if hit is None:
+        hit = await asyncio.to_thread(cache.get, key)
+    if hit is not None:
+        return hit
+
+    async def compute():
+        async with admission.slot(bounded=bounded):
+            if async_driver.enabled() and needs_text(fields, include_raw):
+                result = await _recognize_async_engine(image_bytes, lang, fields, include_raw)
+            else:
+                result = await pool.recognize(image_bytes, lang=lang, fields=fields, include_raw=include_raw)
+        with metrics.stage("sanitize"):
+            body = dumps(result)
+        await asyncio.to_thread(cache.put, key, body)
+        return body
+
+    return await flights.do(key, compute, timeout=timeout)
+
+# durable queue for POST /jobs, drained in the background by the same pool
+jobs = JobQueue()
+_job_wakeup = asyncio.Event()
+_background_tasks = []
 
-    # complex -> not JSON serializable, drop it
-    if isinstance(obj, complex):
-        return None
+async def _drain_jobs():
+    while True:
+        job = await asyncio.to_thread(jobs.claim)
+        if job is None:
+            _job_wakeup.clear()
+            try:
+                await asyncio.wait_for(_job_wakeup.wait(), timeout=OCR_JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        # waiting for a slot can outlast the lease; keep it while this attempt is alive
+        renewal = asyncio.create_task(_renew_lease(job["id"], job["started_at"]))
+        try:
+            result = await _recognize(job["image"], job["lang"], bounded=False)
+            await asyncio.to_thread(jobs.complete, job["id"], job["started_at"], result)
+        except asyncio.CancelledError:
+            # shutting down: the lease expires and the job is picked up again after restart
+            raise
+        except Exception as e:
+            await asyncio.to_thread(jobs.fail, job["id"], job["started_at"], str(e))
+        finally:
+            renewal.cancel()
 
-    # floats/ints/bools/str
-    if isinstance(obj, (float, int, bool, str)):
-        # float already checked above for non-finite
-        return obj
+async def _renew_lease(job_id, started_at):
+    while True:
+        await asyncio.sleep(jobs.lease / 3)
+        if not await asyncio.to_thread(jobs.renew, job_id, started_at):
+            return
 
-    # fallback: try to convert to python scalar
+async def _warm_pool():
     try:
-        return obj.__dict__ if hasattr(obj, "__dict__") else str(obj)
-    except Exception:
-        return None
+        await pool.start()
+    except Exception as e:
+        pool.warmup_error = str(e)
 
-app = FastAPI(title="Visiting Card OCR API")
+@app.on_event("startup")
+async def startup():
+    # warm every worker in the background; /ready reports when it is done
+    _background_tasks.append(asyncio.create_task(_warm_pool()))
+    for _ in range(pool.workers):
+        _background_tasks.append(asyncio.create_task(_drain_jobs()))
 
-recognizer = Recognize()
+@app.on_event("shutdown")
+async def shutdown():
+    for t in _background_tasks:
+        t.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    pool.shutdown()
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    # load figures let a balancer route around hot instances
+    return {"status": "ok", **admission.snapshot()}
+
+@app.get("/ready")
+def ready():
+    # unlike /health, only 200 once every worker has loaded its languages and OCRed a test card;
+    # back to 503 while the pool is rebuilt after a worker process died
+    if pool.ready:
+        return {"status": "ready", "workers": pool.workers}
+    if pool.warmup_error:
+        return JSONResponse({"status": "failed", "detail": pool.warmup_error}, status_code=503)
+    return JSONResponse({"status": "warming"}, status_code=503)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/extract")
-async def extract(file: UploadFile = File(...), lang: str = Form("eng")):
-    print("=== OCR PIPELINE START ===")
+async def extract(file: UploadFile = File(...), lang: str = Form("eng"),
+                  fields: str = Form(None), include_raw: bool = Form(False)):
+    """
+    fields: optional comma separated list (e.g. "email,mobile") - only those
+    keys are returned and stages they do not need are skipped.
+    include_raw: also return the tesseract word-level dict and the PSM passes that ran.
+    """
     try:
-        image_bytes = await file.read()
+        wanted = parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+    try:
+        with metrics.stage("upload_read"):
+            image_bytes = await file.read()
         if not image_bytes:
             return JSONResponse({"detail": "provide file"}, status_code=400)
-        result= recognizer.recognize(image_bytes, lang=lang)
-        safe= sanitize(result)
-        return JSONResponse(content= safe)
+        metrics.BYTES_PROCESSED.inc(len(image_bytes))
+        body= await _recognize(image_bytes, lang, timeout=OCR_REQUEST_TIMEOUT,
+                               fields=wanted, include_raw=include_raw)
+        return SafeJSONResponse(content= body)
+    except Overloaded as e:
+        return _busy(e)
+    except asyncio.TimeoutError:
+        return JSONResponse({"detail": "OCR timed out"}, status_code=504)
     except Exception as e:
         return JSONResponse(
             {"error": "OCR pipeline error", "detail": str(e), "trace": traceback.format_exc()},
             status_code=500
         )
+
+async def _recognize_indexed(index, image_bytes, lang, reservation, fields=None):
+    # returns (index, result, error) so one bad card never aborts the batch
+    if not image_bytes:
+        admission.release(reservation)
+        return index, None, "provide file"
+    try:
+        # the batch as a whole was admitted, so its cards wait for slots instead of bouncing
+        with admission.holding(reservation):
+            return index, await _recognize(image_bytes, lang, timeout=OCR_REQUEST_TIMEOUT, bounded=False,
+                                           fields=fields), None
+    except asyncio.TimeoutError:
+        return index, None, "OCR timed out"
+    except Exception as e:
+        return index, None, str(e)
+
+@app.post("/extract/batch")
+async def extract_batch(files: List[UploadFile] = File(...), lang: str = Form("eng"), fields: str = Form(None)):
+    """
+    Run many cards through the recognition pool concurrently and stream one
+    JSON line per card (NDJSON) as soon as it finishes, in completion order.
+    Every line carries the card's position in the upload as "index".
+    """
+    try:
+        wanted = parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+    try:
+        # a queue place for every card, so concurrent batches stay within OCR_MAX_QUEUE
+        reservations = admission.reserve(len(files))
+    except Overloaded as e:
+        return _busy(e)
+    names = [f.filename for f in files]
+    try:
+        with metrics.stage("upload_read"):
+            images = [await f.read() for f in files]
+    except BaseException:
+        for r in reservations:
+            admission.release(r)
+        raise
+    metrics.BYTES_PROCESSED.inc(sum(len(b) for b in images))
+    tasks = [asyncio.ensure_future(_recognize_indexed(i, b, lang, reservations[i], wanted))
+             for i, b in enumerate(images)]
+
+    async def stream():
+        try:
+            for fut in asyncio.as_completed(tasks):
+                index, result, error = await fut
+                line = {"index": index, "filename": names[index]}
+                if error is None:
+                    # splice the already encoded result into the line
+                    yield dumps(line)[:-1] + b',"result":' + result + b"}\n"
+                else:
+                    line["error"] = "OCR pipeline error"
+                    line["detail"] = error
+                    yield dumps(line) + b"\n"
+        finally:
+            # client went away or stream finished: drop whatever is still queued
+            for t in tasks:
+                t.cancel()
+            # cards cancelled before they started never released their places
+            for r in reservations:
+                admission.release(r)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/jobs")
+async def submit_job(file: UploadFile = File(...), lang: str = Form("eng")):
+    with metrics.stage("upload_read"):
+        image_bytes = await file.read()
+    if not image_bytes:
+        return JSONResponse({"detail": "provide file"}, status_code=400)
+    metrics.BYTES_PROCESSED.inc(len(image_bytes))
+    job_id = await asyncio.to_thread(jobs.submit, image_bytes, lang)
+    _job_wakeup.set()
+    return JSONResponse({"id": job_id, "status": "queued"}, status_code=202)
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
+        return JSONResponse({"detail": "job not found"}, status_code=404)
+    return JSONResponse(job)
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
+        return JSONResponse({"detail": "job not found"}, status_code=404)
+    if job["status"] == FAILED:
+        return JSONResponse({"error": "OCR pipeline error", "detail": job["error"], "status": FAILED}, status_code=500)
+    if job["status"] != DONE:
+        return JSONResponse({"detail": "job not finished", "status": job["status"]}, status_code=409)
+    result = await asyncio.to_thread(jobs.result, job_id)
+    return SafeJSONResponse(content=result.encode("utf-8"))
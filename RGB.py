@@ -1,23 +1,31 @@
-import os
 import io
 import re
 import numpy as np
 from PIL import Image
 import pytesseract
-from pytesseract import Output
 import cv2
+from ocr import engine_pool
+from ocr import metrics, regions, digits, orientation
+from ocr.wordtable import WordTable
+from ocr.fields import needs_digits
+from ocr.preprocess import open_image, fit_size
+from ocr.config import (OCR_UPRIGHT_MIN_CONF, OCR_UPRIGHT_MIN_WORDS, OCR_PSM_CASCADE,
+                        OCR_CASCADE_MIN_CONF, OCR_CASCADE_MIN_WORDS, OCR_REGIONS,
+                        OCR_DIGIT_REFINE)
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\tesseract\tesseract.exe"
 
-def ensure_rgb(img):
+# OSD only needs the page layout; encoded uploads are decoded no larger than this
+_OSD_MAX_SIDE = 2000
+
+def ensure_rgb(img, max_side=None):
+    """BGR array for img; encoded JPEGs are decoded reduced (DCT domain) toward max_side pixels long."""
     if isinstance(img, Image.Image):
         pil_rgb = img.convert("RGB")
         arr = np.array(pil_rgb)
         return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
     if isinstance(img, (bytes, bytearray)):
-        pil = Image.open(io.BytesIO(img)).convert("RGB")
-        arr = np.array(pil)
-        return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+        return cv2.cvtColor(np.array(_open(img, "RGB", max_side)), cv2.COLOR_RGB2BGR)
     if isinstance(img, np.ndarray):
         if img.ndim == 2:
             return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
@@ -29,55 +37,233 @@ def ensure_rgb(img):
                 return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
         return img
     try:
-        pil = Image.open(io.BytesIO(img)).convert("RGB")
-        arr = np.array(pil)
-        return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+        return cv2.cvtColor(np.array(_open(img, "RGB", max_side)), cv2.COLOR_RGB2BGR)
     except Exception as e:
         raise ValueError("Unsupported image input to ensure_rgb") from e
 
-def get_osd_rotation(img):
+def _open(data, mode, max_side=None):
+    data = bytes(data)
+    size = None
+    if max_side:
+        size = fit_size(Image.open(io.BytesIO(data)).size, max_side)
+    return open_image(data, mode, size)
+
+def _load(img, max_side=None):
+    """
+    Engine input for img without a re-encode: 2D (grayscale) arrays pass through
+    untouched, colour arrays are swapped BGR -> RGB, encoded bytes are decoded once,
+    straight to grayscale (tesseract works on gray) and, with max_side, reduced.
+    Both engine_pool and pytesseract take the result as is.
+    """
+    if isinstance(img, (bytes, bytearray, memoryview)):
+        return _open(img, "L", max_side)
+    if isinstance(img, np.ndarray):
+        if img.ndim == 2:
+            return img
+        return cv2.cvtColor(ensure_rgb(img), cv2.COLOR_BGR2RGB)
+    return img if img.mode in ("L", "RGB") else img.convert("RGB")
+
+def _rotate(img, rotation):
+    # "Rotate:" is clockwise; np.rot90 and PIL rotate counter-clockwise
+    if isinstance(img, np.ndarray):
+        return np.ascontiguousarray(np.rot90(img, -(rotation // 90)))
+    return img.rotate(-rotation, expand=True)
+
+def get_orientation(img):
+    """
+    (rotation, method) for img: the EXIF tag of an upload, then the profile
+    classifier (ocr.orientation), and tesseract OSD on the densest crop only
+    when that is inconclusive. method is "exif", "profile", "osd" or
+    "default" (nothing could tell; rotation 0).
+    """
+    exif = 0
+    if isinstance(img, (bytes, bytearray, memoryview)):
+        exif = orientation.exif_rotation(bytes(img)) or 0
     try:
-        if isinstance(img, (bytes, bytearray)):
-            pil = Image.open(io.BytesIO(img))
-        elif isinstance(img, np.ndarray):
-            pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        else:
-            pil = img
-        osd = pytesseract.image_to_osd(pil)
-        m = re.search(r'Rotate:\s+(\d+)', osd)
-        return int(m.group(1)) if m else 0
+        img = orientation.rotate(np.asarray(_load(img, _OSD_MAX_SIDE)), exif)
+        rotation, confident = orientation.classify(img)
+        method = "profile"
+        if not confident:
+            # with tesserocr: persistent in-process engine, no fork, osd data already loaded
+            rotation, method = _osd(orientation.dense_crop(img))[0], "osd"
     except Exception:
-        return 0
+        rotation, method = 0, "default"
+    if exif and not rotation % 360:
+        method = "exif"
+    return (exif + rotation) % 360, method
 
-def run_tesseract_data(img, lang="eng"):
-    try:
-        if isinstance(img, (bytes, bytearray)):
-            pil = Image.open(io.BytesIO(img)).convert("RGB")
-        elif isinstance(img, np.ndarray):
-            pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+def get_osd_rotation(img):
+    return get_orientation(img)[0]
+
+def _image_to_data(img, lang, psm=None, variables=None):
+    """One recognition pass over img as an ocr.wordtable.WordTable."""
+    if engine_pool.enabled():
+        return WordTable.from_tsv(engine_pool.image_to_tsv(img, lang=lang, psm=psm, variables=variables))
+    config = f"--psm {psm}" if psm is not None else ""
+    for name, value in (variables or {}).items():
+        config += f" -c {name}={value}"
+    return WordTable.from_tsv(pytesseract.image_to_data(img, lang=lang, config=config))
+
+def result_from_words(words, **extra):
+    """Driver result dict for a WordTable (shared by every backend)."""
+    lines, confs = words.lines()
+    mean_conf, _ = words.mean_conf()
+    # "raw" keeps the pytesseract Output.DICT layout for API consumers
+    return dict(extra, text=lines, conf=confs, mean_conf=mean_conf, raw=words.to_dict())
+
+def image_to_words(img, lang="eng", psm=None, variables=None):
+    """One recognition pass over img as an ocr.wordtable.WordTable."""
+    return _image_to_data(_load(img), lang, psm, variables)
+
+def run_tesseract_data(img, lang="eng", psm=None):
+    """
+    {"text": lines, "conf": per-line mean confidence, "mean_conf", "raw": Output.DICT layout}
+    """
+    return result_from_words(_image_to_data(_load(img), lang, psm))
+
+def parse_osd(osd):
+    """(rotation, script) from image_to_osd / --psm 0 text output."""
+    m = re.search(r'Rotate:\s+(\d+)', osd)
+    rotation = int(m.group(1)) if m else 0
+    m = re.search(r'Script:\s+(\S+)', osd)
+    return rotation, (m.group(1) if m else None)
+
+def _osd(img):
+    """(rotation, script) from a separate OSD run; script is None when unknown."""
+    if engine_pool.enabled():
+        return engine_pool.osd_rotation(img), None
+    return parse_osd(pytesseract.image_to_osd(img))
+
+# ---------- analysis plan ----------
+# analyze() is written as a generator of engine requests so the same logic can
+# be driven synchronously here or with asyncio subprocesses (ocr.async_driver):
+#
+#   ("data", img, lang, psm, variables)  -> WordTable
+#   ("osd", img)                         -> (rotation, script)
+#   ("analyze", img, lang)               -> (rotation, WordTable), tesserocr only
+#   ("batch", [data requests])           -> [WordTable, ...], run concurrently
+
+def _cascade(img, lang, data, steps):
+    """
+    Walk the PSM cascade until a pass is good enough (OCR_CASCADE_MIN_CONF and
+    OCR_CASCADE_MIN_WORDS). data is the result for steps[0], already computed.
+    Returns (data, psm, tried); if no pass qualifies the best scoring one is kept.
+    """
+    tried = []
+    best = None
+    for i, psm in enumerate(steps):
+        if i:
+            data = yield from _pass(img, lang, psm)
+        conf, words = data.mean_conf()
+        tried.append({"psm": psm, "conf": round(conf, 2), "words": words})
+        # score: summed word confidence, so a pass reading more words confidently wins
+        if best is None or conf * words > best[0]:
+            best = (conf * words, data, psm)
+        if conf >= OCR_CASCADE_MIN_CONF and words >= OCR_CASCADE_MIN_WORDS:
+            return data, psm, tried
+    return best[1], best[2], tried
+
+def _pass(img, lang, psm):
+    if psm == "regions":
+        return (yield from regions.plan(img, lang))
+    return (yield ("data", img, lang, psm, None))
+
+def plan(img, lang="eng", in_process=None, fields=None):
+    """
+    Generator behind analyze(). fields are the requested response fields
+    (None: all); the digit re-read only runs when one of them needs it. in_process says
+    whether requests are served by in-process tesserocr handles (defaults to
+    engine_pool.enabled()), which decides the "auto" region mode and allows
+    the single-pass AUTO_OSD analysis.
+    """
+    img = _load(img)
+    in_process = engine_pool.enabled() if in_process is None else in_process
+    # "auto": one fork per crop makes per-region passes a loss for a subprocess engine
+    use_regions = OCR_REGIONS in ("1", "true", "yes", "on") or (OCR_REGIONS == "auto" and in_process)
+    steps = (["regions"] if use_regions else []) + OCR_PSM_CASCADE
+    steps = steps or [None]
+    script = None
+    # a confident profile classifier settles orientation before any engine pass
+    rotation, confident = orientation.classify(img)
+    if confident:
+        method = "profile"
+        if rotation % 360:
+            img = _rotate(img, rotation)
+        data = yield from _pass(img, lang, steps[0])
+    else:
+        if in_process and steps == [None]:
+            rotation, data = yield ("analyze", img, lang)
+            method = "osd"
         else:
-            pil = img.convert("RGB")
-        data = pytesseract.image_to_data(pil, output_type=Output.DICT, lang=lang)
-        text_lines = []
-        # Reconstruct simple text lines from the data output
-        n = len(data.get("text", []))
-        current_line = []
-        last_block_num = -1
-        for i in range(n):
-            word = data["text"][i].strip()
-            if not word:
-                continue
-            block = (data.get("block_num", [None]*n))[i]
-            line_num = (data.get("line_num", [None]*n))[i]
-            if (block, line_num) != (last_block_num, data.get("line_num", [None]*n)[i]):
-                if current_line:
-                    text_lines.append(" ".join(current_line))
-                current_line = [word]
-                last_block_num = block
+            data = yield from _pass(img, lang, steps[0])
+            rotation, method = 0, "first_pass"
+            conf, words = data.mean_conf()
+            if conf < OCR_UPRIGHT_MIN_CONF or words < OCR_UPRIGHT_MIN_WORDS:
+                try:
+                    # OSD on a reduced crop of the densest text, not the whole page
+                    rotation, script = yield ("osd", orientation.dense_crop(img))
+                    method = "osd"
+                except Exception:
+                    rotation, method = 0, "default"
+
+        if rotation % 360:
+            img = _rotate(img, rotation)
+            data = yield from _pass(img, lang, steps[0])
+    data, psm, tried = yield from _cascade(img, lang, data, steps)
+    metrics.PSM_SELECTED.inc(label_value="default" if psm is None else psm)
+    refined = 0
+    if OCR_DIGIT_REFINE and needs_digits(fields):
+        # phone / fax / PIN spans read again from small crops with a digit whitelist
+        data, refined = yield from digits.plan(img, data, lang)
+        metrics.DIGIT_SPANS_REFINED.inc(refined)
+    return result_from_words(data, rotation=rotation, orientation_method=method, script=script, psm=psm,
+                             cascade=tried, digits_refined=refined)
+
+def _serve(request):
+    kind = request[0]
+    if kind == "data":
+        return _image_to_data(*request[1:])
+    if kind == "osd":
+        return _osd(request[1])
+    if kind == "analyze":
+        rotation, tsv = engine_pool.analyze(request[1], lang=request[2])
+        return rotation, WordTable.from_tsv(tsv)
+    if kind == "batch":
+        return regions.map_concurrent(_serve, request[1])
+    raise ValueError(f"unknown engine request {kind!r}")
+
+def drive(gen, serve):
+    """Run a plan generator to completion, answering its requests with serve()."""
+    try:
+        request = next(gen)
+        while True:
+            try:
+                result = serve(request)
+            except Exception as e:
+                request = gen.throw(e)
             else:
-                current_line.append(word)
-        if current_line:
-            text_lines.append(" ".join(current_line))
-        return {"text": text_lines, "raw": data}
-    except Exception as e:
-        raise
+                request = gen.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+def analyze(img, lang="eng", fields=None):
+    """
+    Orientation and word data from one analysis of img.
+
+    Returns run_tesseract_data()'s dict plus "rotation", "script", "psm",
+    "cascade" and "digits_refined" (see ocr.digits); rotation has the same
+    meaning as get_osd_rotation() and the words are those of the upright image.
+
+    With a PSM cascade (OCR_PSM_CASCADE, cheapest first; led by per-region line
+    passes, see ocr.regions, when OCR_REGIONS is on) the first step is run,
+    and only when its words look wrong (below OCR_UPRIGHT_MIN_CONF / _MIN_WORDS)
+    is a separate OSD run made; the image is rotated only when not upright. Later
+    steps run only while the result stays below OCR_CASCADE_MIN_CONF / _MIN_WORDS.
+    "psm" is the step that was kept, "cascade" every pass that was tried.
+
+    Without a cascade the tesserocr engine gets orientation and words from a
+    single PSM.AUTO_OSD run.
+
+    fields (None: all) limits the digit re-read to requests that use it.
+    """
+    return drive(plan(img, lang, fields=fields), _serve)
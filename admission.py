@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from ocr import metrics
+
+
+class Overloaded(Exception):
+    """Raised when both the recognition slots and the wait queue are full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Reservation:
+    """A queue place reserved for one card of an admitted batch (see AdmissionController.reserve)."""
+
+    __slots__ = ("held",)
+
+    def __init__(self):
+        self.held = True
+
+
+# the reservation of the batch card the current task is recognising, if any
+_reservation = contextvars.ContextVar("ocr_admission_reservation", default=None)
+
+
+class AdmissionController:
+    """
+    Caps concurrent recognitions at max_concurrent and lets at most max_queue
+    further requests wait for a slot. Anything beyond that is rejected at once
+    with a Retry-After estimated from recent per-card latency.
+
+    A batch is admitted whole: reserve() takes a queue place for every card up
+    front, so concurrent batches cannot together exceed the wait queue.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, default_latency: float = 2.0):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.active = 0
+        self.waiting = 0
+        # places taken by admitted batch cards that have not reached a slot yet
+        self.reserved = 0
+        # exponentially weighted moving average of seconds per card
+        self.latency = default_latency
+        self._sem = asyncio.Semaphore(self.max_concurrent)
+        self.rejected = metrics.Counter("ocr_rejected_total", "Requests rejected with 429 by admission control")
+        metrics.Gauge("ocr_active_recognitions", "Recognitions currently running", lambda: self.active)
+        metrics.Gauge("ocr_queue_depth", "Requests waiting for a recognition slot", lambda: self.waiting)
+        metrics.Gauge("ocr_card_latency_seconds", "Moving average of per-card recognition time", lambda: self.latency)
+
+    def full(self):
+        # requests only wait once every slot is taken, so this is "slots and queue both full"
+        return self.active + self.waiting + self.reserved >= self.max_concurrent + self.max_queue
+
+    def retry_after(self) -> int:
+        # time for everything ahead of a new request to drain through the slots
+        backlog = self.active + self.waiting + self.reserved
+        return max(1, math.ceil(self.latency * backlog / self.max_concurrent))
+
+    def check(self):
+        if self.full():
+            self.rejected.inc()
+            raise Overloaded(self.retry_after())
+
+    def reserve(self, n: int):
+        """
+        Admit a batch of n cards: one Reservation each, or Overloaded unless all
+        of them fit in the free slots plus the wait queue. Each card runs under
+        holding() its reservation; release() any that never ran.
+        """
+        free = self.max_concurrent + self.max_queue - self.active - self.waiting - self.reserved
+        if n > free:
+            self.rejected.inc()
+            raise Overloaded(self.retry_after())
+        self.reserved += n
+        return [Reservation() for _ in range(n)]
+
+    def release(self, reservation: Reservation):
+        if reservation.held:
+            reservation.held = False
+            self.reserved -= 1
+
+    @contextmanager
+    def holding(self, reservation: Reservation):
+        """Let the slot() taken in this task (and tasks it starts) use reservation; release it after."""
+        token = _reservation.set(reservation)
+        try:
+            yield
+        finally:
+            _reservation.reset(token)
+            self.release(reservation)
+
+    @asynccontextmanager
+    async def slot(self, bounded: bool = True):
+        """
+        Hold one recognition slot; bounded=False waits even when the queue is
+        full. A batch card's reservation is turned into its place in the queue.
+        """
+        reservation = _reservation.get()
+        if reservation is not None and reservation.held:
+            self.release(reservation)
+        elif bounded:
+            self.check()
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+            self.latency = 0.8 * self.latency + 0.2 * (time.monotonic() - start)
+
+    def snapshot(self):
+        return {
+            "active": self.active,
+            "queued": self.waiting,
+            "reserved": self.reserved,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected.value,
+        }
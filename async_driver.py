@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import numpy as np
+import pytesseract
+
+from ocr import engine_pool, metrics
+from ocr import tesseract_driver as driver
+from ocr.config import OCR_ASYNC_ENGINE, OCR_BACKEND, OCR_REGION_THREADS
+from ocr.wordtable import WordTable
+
+# Tesseract driven from the event loop: every pass is an asyncio subprocess
+# fed a PGM/PPM image on stdin and read back as TSV on stdout (no temp files).
+# Each call carries a deadline; when it passes, or the awaiting task is
+# cancelled (client gone, request abandoned), the child is killed at once
+# instead of running on and pinning a CPU. Only the waits for those children
+# happen on the loop: the plan's own work (classification, region morphology,
+# crops), PNM encoding and TSV parsing run in worker threads.
+
+ENGINE_KILLED = metrics.Counter("ocr_engine_killed_total", "Tesseract processes killed before finishing", label="reason")
+
+
+class TesseractError(RuntimeError):
+    pass
+
+
+def enabled():
+    """True when the service runs tesseract from the event loop (OCR_ASYNC_ENGINE, "auto": without tesserocr)."""
+    if OCR_BACKEND != "tesseract":
+        return False
+    if OCR_ASYNC_ENGINE == "auto":
+        return not engine_pool.enabled()
+    return OCR_ASYNC_ENGINE in ("1", "true", "yes", "on")
+
+
+def encode_pnm(img):
+    """Uncompressed PGM (grayscale) or PPM (RGB) bytes: a header plus the raw pixels."""
+    arr = np.ascontiguousarray(np.asarray(img, dtype=np.uint8))
+    h, w = arr.shape[:2]
+    magic = b"P5" if arr.ndim == 2 else b"P6"
+    return b"%s\n%d %d\n255\n" % (magic, w, h) + arr.tobytes()
+
+
+def _remaining(deadline):
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+async def _run(args, stdin, deadline):
+    proc = await asyncio.create_subprocess_exec(
+        pytesseract.pytesseract.tesseract_cmd, *args,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(stdin), _remaining(deadline))
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        if proc.returncode is None:
+            proc.kill()
+            ENGINE_KILLED.inc(label_value="deadline" if isinstance(e, asyncio.TimeoutError) else "cancelled")
+            # reap the child even if we are being cancelled
+            await asyncio.shield(proc.wait())
+        raise
+    if proc.returncode != 0:
+        raise TesseractError(f"tesseract exited with {proc.returncode}: {err.decode('utf-8', 'replace').strip()}")
+    return out.decode("utf-8", "replace")
+
+
+async def image_to_tsv(img, lang="eng", psm=None, variables=None, deadline=None):
+    """TSV text for img; deadline is a time.monotonic() value or None."""
+    args = ["stdin", "stdout", "-l", lang]
+    if psm is not None:
+        args += ["--psm", str(psm)]
+    for name, value in (variables or {}).items():
+        args += ["-c", f"{name}={value}"]
+    args.append("tsv")
+    return await _run(args, await asyncio.to_thread(encode_pnm, img), deadline)
+
+
+async def image_to_osd(img, deadline=None):
+    pnm = await asyncio.to_thread(encode_pnm, img)
+    return await _run(["stdin", "stdout", "--psm", "0", "-l", "osd"], pnm, deadline)
+
+
+async def _serve(request, deadline, limit):
+    kind = request[0]
+    if kind == "data":
+        _, img, lang, psm, variables = request
+        async with limit:
+            tsv = await image_to_tsv(img, lang, psm, variables, deadline)
+        return await asyncio.to_thread(WordTable.from_tsv, tsv)
+    if kind == "osd":
+        async with limit:
+            return driver.parse_osd(await image_to_osd(request[1], deadline))
+    if kind == "batch":
+        tasks = [asyncio.ensure_future(_serve(r, deadline, limit)) for r in request[1]]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # one crop failed or we were cancelled: kill the passes still running
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    raise ValueError(f"unknown engine request {kind!r}")
+
+
+def _advance(step, value):
+    # StopIteration cannot cross into an asyncio future; hand the return value back instead
+    try:
+        return False, step(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+async def analyze(img, lang="eng", deadline=None, fields=None):
+    """
+    Same analysis and result as tesseract_driver.analyze, with every tesseract
+    pass run as a killable asyncio subprocess. Raises asyncio.TimeoutError once
+    the deadline (time.monotonic()) passes; cancelling the caller kills the
+    running passes.
+    """
+    gen = driver.plan(img, lang, in_process=False, fields=fields)
+    # at most OCR_REGION_THREADS tesseract children per card
+    limit = asyncio.Semaphore(OCR_REGION_THREADS)
+    step, value = gen.send, None
+    while True:
+        # cancelled mid-step, the thread finishes the step and the generator is dropped
+        done, request = await asyncio.to_thread(_advance, step, value)
+        if done:
+            return request
+        try:
+            result = await _serve(request, deadline, limit)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            gen.close()
+            raise
+        except Exception as e:
+            step, value = gen.throw, e
+        else:
+            step, value = gen.send, result
@@ -0,0 +1,156 @@
+"""
+OCR backends: what Recognize needs from an engine, and a registry to pick one
+by name (OCR_BACKEND).
+
+    tesseract  the real engine, via ocr.tesseract_driver
+    stub       replays recorded TSV fixtures; deterministic, no tesseract
+               needed - for benchmarking and load-testing the heuristics,
+               serialization and API layers
+
+Record a fixture from a real card (needs tesseract):
+
+    python -m ocr.backends record card.jpg fixtures/card.tsv [--lang eng]
+"""
+import argparse
+import glob
+import hashlib
+import os
+import time
+from typing import Any, Dict, Protocol, Tuple
+
+import numpy as np
+
+from ocr import tesseract_driver as driver
+from ocr.config import OCR_BACKEND, OCR_STUB_FIXTURES, OCR_STUB_LATENCY
+from ocr.wordtable import WordTable
+
+
+class Backend(Protocol):
+    name: str
+
+    def orientation(self, img) -> Tuple[int, str]:
+        """(degrees to rotate img clockwise to upright, as OSD's 'Rotate:', method that decided)."""
+
+    def words(self, img, lang: str = "eng", psm=None, variables=None) -> WordTable:
+        """Word-level data for one recognition pass."""
+
+    def lines(self, img, lang: str = "eng") -> Dict[str, Any]:
+        """Line data: {"text", "conf", "mean_conf", "raw"} as tesseract_driver.run_tesseract_data."""
+
+    def analyze(self, img, lang: str = "eng", fields=None) -> Dict[str, Any]:
+        """Orientation plus line data for the upright image, as tesseract_driver.analyze."""
+
+
+_REGISTRY = {}
+_instances = {}
+
+
+def register(name):
+    def deco(cls):
+        cls.name = name
+        _REGISTRY[name] = cls
+        return cls
+    return deco
+
+
+def available():
+    return sorted(_REGISTRY)
+
+
+def get_backend(name=None) -> Backend:
+    """The (per process, shared) backend called name, default OCR_BACKEND."""
+    name = (name or OCR_BACKEND).lower()
+    if name not in _REGISTRY:
+        raise ValueError(f"unknown OCR backend {name!r}; available: {', '.join(available())}")
+    if name not in _instances:
+        _instances[name] = _REGISTRY[name]()
+    return _instances[name]
+
+
+@register("tesseract")
+class TesseractBackend:
+
+    def orientation(self, img):
+        return driver.get_orientation(img)
+
+    def words(self, img, lang="eng", psm=None, variables=None):
+        return driver.image_to_words(img, lang, psm, variables)
+
+    def lines(self, img, lang="eng"):
+        return driver.run_tesseract_data(img, lang=lang)
+
+    def analyze(self, img, lang="eng", fields=None):
+        return driver.analyze(img, lang=lang, fields=fields)
+
+
+@register("stub")
+class StubBackend:
+    """
+    Replays the *.tsv files in OCR_STUB_FIXTURES. The fixture for an image is
+    picked by a hash of its pixels, so the same card always gets the same
+    words; OCR_STUB_LATENCY seconds of sleep per pass stand in for engine time.
+    """
+
+    def __init__(self, directory=None, latency=None):
+        self.directory = directory or OCR_STUB_FIXTURES
+        self.latency = OCR_STUB_LATENCY if latency is None else latency
+        self.fixtures = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.tsv"))):
+            with open(path, encoding="utf-8") as f:
+                self.fixtures.append(WordTable.from_tsv(f.read()))
+        if not self.fixtures:
+            raise RuntimeError(f"no *.tsv fixtures in {self.directory}")
+
+    def _pick(self, img):
+        if isinstance(img, (bytes, bytearray)):
+            data = bytes(img)
+        else:
+            data = np.asarray(img).tobytes()
+        h = int.from_bytes(hashlib.sha256(data).digest()[:8], "big")
+        return self.fixtures[h % len(self.fixtures)]
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def orientation(self, img):
+        self._wait()
+        return 0, "stub"
+
+    def words(self, img, lang="eng", psm=None, variables=None):
+        self._wait()
+        return self._pick(img)
+
+    def lines(self, img, lang="eng"):
+        return driver.result_from_words(self.words(img, lang))
+
+    def analyze(self, img, lang="eng", fields=None):
+        return driver.result_from_words(self.words(img, lang), rotation=0, orientation_method="stub",
+                                        script=None, psm="stub", cascade=[], digits_refined=0)
+
+
+def record(image_path, out_path, lang="eng"):
+    """Run a card through preprocessing and tesseract and save the words as a fixture."""
+    from ocr.preprocess import preprocess_image
+    with open(image_path, "rb") as f:
+        pre = preprocess_image(f.read())
+    words = get_backend("tesseract").analyze(pre, lang=lang)["raw"]
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(WordTable.from_dict(words).to_tsv())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="record a TSV fixture for the stub backend")
+    rec.add_argument("image")
+    rec.add_argument("out")
+    rec.add_argument("--lang", default="eng")
+    args = ap.parse_args()
+    if args.command == "record":
+        record(args.image, args.out, args.lang)
+
+
+if __name__ == "__main__":
+    main()
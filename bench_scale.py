@@ -0,0 +1,103 @@
+"""
+Benchmark: fixed 2x upscale versus resolution-adaptive scaling in preprocess_image.
+
+    python -m ocr.bench_scale [--corpus DIR] [--lang eng] [--repeat 3] [--no-ocr]
+
+Run it as a module: started as a script, the repository's own decimal.py
+shadows the standard library and Pillow fails to register its PNG plugin.
+
+Each image of a mixed-resolution corpus (a directory of card images, or by
+default the synthetic card rendered as a thumbnail, a flatbed scan and a
+phone photo) is run through preprocess_image twice:
+
+    fixed 2x    the old behaviour, enlarge_factor=2.0 for every image
+    adaptive    scale chosen from the measured text height / DPI
+
+and then through the tesseract backend. Reported per image and mode: the
+preprocessed size, preprocessing and OCR time (best of --repeat), and the
+mean word confidence and word count tesseract returns. --no-ocr times the
+preprocessing only (no tesseract needed).
+"""
+import argparse
+import glob
+import io
+import os
+import time
+
+from PIL import Image
+
+from ocr.preprocess import preprocess_image
+from ocr.warmup import synthetic_card
+
+MODES = (("fixed 2x", 2.0), ("adaptive", None))
+
+
+def synthetic_corpus():
+    card = Image.open(io.BytesIO(synthetic_card()))
+    out = []
+    for name, size in (("thumbnail", (350, 200)), ("scan", (1050, 600)), ("photo", (4000, 2300))):
+        img = card.resize(size, Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=90)
+        out.append((f"{name} {size[0]}x{size[1]}", buf.getvalue()))
+    return out
+
+
+def load_corpus(directory):
+    out = []
+    for ext in ("*.jpg", "*.jpeg", "*.png", "*.tif", "*.tiff", "*.bmp", "*.webp"):
+        for path in sorted(glob.glob(os.path.join(directory, ext))):
+            with open(path, "rb") as f:
+                out.append((os.path.basename(path), f.read()))
+    return out
+
+
+def best_of(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", help="directory of card images (default: synthetic cards at three resolutions)")
+    ap.add_argument("--lang", default="eng")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-ocr", action="store_true", help="time preprocessing only")
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    backend = None
+    if not args.no_ocr:
+        from ocr.backends import get_backend
+        backend = get_backend("tesseract")
+
+    totals = {name: [0.0, 0.0, []] for name, _ in MODES}
+    for label, data in corpus:
+        print(label)
+        for name, factor in MODES:
+            pre_s, arr = best_of(lambda: preprocess_image(data, enlarge_factor=factor), args.repeat)
+            line = f"  {name:10s} {arr.shape[1]:5d}x{arr.shape[0]:<5d} preprocess {pre_s * 1e3:8.1f} ms"
+            totals[name][0] += pre_s
+            if backend is not None:
+                ocr_s, result = best_of(lambda: backend.analyze(arr, lang=args.lang), args.repeat)
+                words = sum(1 for t in result["raw"]["text"] if t.strip())
+                line += f"  ocr {ocr_s * 1e3:8.1f} ms  conf {result['mean_conf']:5.1f}  words {words}"
+                totals[name][1] += ocr_s
+                totals[name][2].append(result["mean_conf"])
+            print(line)
+
+    print(f"total over {len(corpus)} images")
+    for name, (pre_s, ocr_s, confs) in totals.items():
+        line = f"  {name:10s} preprocess {pre_s * 1e3:8.1f} ms"
+        if confs:
+            line += f"  ocr {ocr_s * 1e3:8.1f} ms  mean conf {sum(confs) / len(confs):5.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
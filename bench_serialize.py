@@ -0,0 +1,132 @@
+"""
+Benchmark: ocr.serializer.dumps vs the existing sanitize() variants + json.dumps.
+
+    python -m ocr.bench_serialize [--words 400] [--lines 30] [--iterations 500]
+
+Run it as a module: started as a script, the repository's own decimal.py
+shadows the standard library. The Aapp and format sanitize() variants are
+top-level files, not package modules, so they are loaded by file path.
+
+Builds a synthetic /extract result with "lines" and a tesseract-style "raw"
+dict (numpy ints, NaN confidences) and times each variant end to end, i.e.
+sanitize + encode to the bytes that go on the wire.
+"""
+import argparse
+import contextlib
+import importlib
+import importlib.util
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+
+def make_result(n_words, n_lines):
+    rng = np.random.default_rng(0)
+    conf = rng.uniform(-1, 96, n_words)
+    conf[::17] = np.nan
+    raw = {
+        "level": [np.int64(5)] * n_words,
+        "page_num": [np.int64(1)] * n_words,
+        "block_num": list(rng.integers(0, 6, n_words)),
+        "par_num": list(rng.integers(0, 3, n_words)),
+        "line_num": list(rng.integers(0, 12, n_words)),
+        "word_num": list(rng.integers(0, 10, n_words)),
+        "left": list(rng.integers(0, 2000, n_words)),
+        "top": list(rng.integers(0, 1200, n_words)),
+        "width": list(rng.integers(5, 300, n_words)),
+        "height": list(rng.integers(5, 60, n_words)),
+        "conf": list(conf),
+        "text": [f"word{i}" for i in range(n_words)],
+    }
+    return {
+        "language_detected": "eng",
+        "osd_rotation": 0,
+        "name": "Olivia Wilson",
+        "designation": "Marketing Manager",
+        "company": "Borcelle",
+        "email": "hello@reallygreatsite.com",
+        "mobile": "+1 555-123-4567",
+        "website": "www.reallygreatsite.com",
+        "address": "123 Anywhere St.\nAny City",
+        "lines": [f"line {i} text with some words" for i in range(n_lines)],
+        "confidence": np.float64(87.25),
+        "raw": raw,
+    }
+
+
+def _load(module, attr):
+    try:
+        return getattr(importlib.import_module(module), attr)
+    except Exception as e:
+        print(f"skip {module}.{attr}: {e!r}")
+        return None
+
+
+def _load_file(filename, attr):
+    # Aapp.py / format.py sit next to this file but are not importable as ocr.*
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    try:
+        spec = importlib.util.spec_from_file_location("_bench_" + os.path.splitext(filename)[0], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return getattr(module, attr)
+    except Exception as e:
+        print(f"skip {filename}:{attr}: {e!r}")
+        return None
+
+
+def _json_response_bytes(obj):
+    # what fastapi.responses.JSONResponse.render does
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def variants():
+    out = {}
+    dumps = _load("ocr.serializer", "dumps")
+    if dumps:
+        out["serializer.dumps"] = dumps
+    for label, fn in (("app sanitize", _load_file("Aapp.py", "sanitize")),
+                      ("format sanitize", _load_file("format.py", "sanitize")),
+                      ("recognition sanitize", _load("ocr.recognition", "sanitize"))):
+        if fn:
+            out[label + " + json.dumps"] = (lambda f: lambda obj: _json_response_bytes(f(obj)))(fn)
+    return out
+
+
+def bench(fn, obj, iterations):
+    # format.sanitize prints every non-finite value it meets; keep that off the terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(obj)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(obj)
+        return (time.perf_counter() - start) / iterations
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--words", type=int, default=400)
+    ap.add_argument("--lines", type=int, default=30)
+    ap.add_argument("--iterations", type=int, default=500)
+    args = ap.parse_args()
+
+    obj = make_result(args.words, args.lines)
+    results = []
+    for name, fn in variants().items():
+        try:
+            secs = bench(fn, obj, args.iterations)
+        except Exception as e:
+            # a variant that leaves a value json.dumps rejects, or whose module cannot import
+            print(f"{name:40s} failed: {e!r}")
+            continue
+        results.append((name, secs))
+    base = max(s for _, s in results) if results else 0
+    for name, secs in sorted(results, key=lambda r: r[1]):
+        print(f"{name:40s} {secs * 1e6:10.1f} us/response  {base / secs:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
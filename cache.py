@@ -0,0 +1,196 @@
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from ocr import config
+from ocr.config import OCR_CACHE_MAX_BYTES, OCR_CACHE_DIR, OCR_CACHE_DISK_MAX_BYTES, OCR_CACHE_MAX_AGE
+from ocr import metrics
+
+# modules whose source decides what a cached result looks like
+_PIPELINE_MODULES = ("ocr.recognition", "ocr.preprocess", "ocr.tesseract_driver", "ocr.regions",
+                     "ocr.wordtable", "ocr.digits", "ocr.backends", "ocr.orientation")
+
+# settings that change what a recognition returns; the disk tier outlives
+# restarts, so a changed value must not hit results made under the old one
+_RESULT_SETTINGS = (
+    "OCR_PIPELINE_VERSION", "OCR_BACKEND", "OCR_ENGINE", "OCR_ASYNC_ENGINE", "OCR_TESSDATA",
+    "OCR_UPRIGHT_MIN_CONF", "OCR_UPRIGHT_MIN_WORDS",
+    "OCR_PSM_CASCADE", "OCR_CASCADE_MIN_CONF", "OCR_CASCADE_MIN_WORDS",
+    "OCR_REGIONS", "OCR_REGION_PAD", "OCR_DIGIT_REFINE", "OCR_DIGIT_WHITELIST",
+    "OCR_TEXT_HEIGHT", "OCR_SCALE_MIN", "OCR_SCALE_MAX", "OCR_FALLBACK_SIDE", "OCR_CARD_DETECT",
+    "OCR_STUB_FIXTURES",
+)
+
+# the disk tier is pruned after this many writes from one process
+_PRUNE_EVERY = 200
+
+
+def pipeline_fingerprint():
+    """Hash of the result-affecting settings and the pipeline source files (read, not imported)."""
+    settings = {name: getattr(config, name, None) for name in _RESULT_SETTINGS}
+    h = hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode())
+    for name in _PIPELINE_MODULES:
+        try:
+            spec = importlib.util.find_spec(name)
+            with open(spec.origin, "rb") as f:
+                h.update(f.read())
+        except Exception:
+            h.update(name.encode())
+    if config.OCR_BACKEND == "stub":
+        # the stub's answers are its fixtures
+        for path in sorted(glob.glob(os.path.join(config.OCR_STUB_FIXTURES, "*.tsv"))):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Content-addressed cache of recognition results.
+
+    Keys are sha256(image bytes) + parameters + pipeline fingerprint; values are
+    the encoded JSON response bytes, so a hit is served without re-encoding.
+    The memory tier is an LRU bounded by the total size of its entries; the
+    optional disk tier (a directory shared by all workers) is consulted on a
+    memory miss and promotes hits back into memory. Disk reads and writes
+    block, so callers on an event loop run get() and put() in a thread after
+    a peek() at memory. Every _PRUNE_EVERY writes the disk tier drops entries
+    unused for max_age seconds, then the least recently used ones until it
+    fits in disk_max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = None, directory: str = None,
+                 disk_max_bytes: int = None, max_age: float = None):
+        self.max_bytes = OCR_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.directory = directory if directory is not None else OCR_CACHE_DIR
+        self.disk_max_bytes = OCR_CACHE_DISK_MAX_BYTES if disk_max_bytes is None else disk_max_bytes
+        self.max_age = OCR_CACHE_MAX_AGE if max_age is None else max_age
+        self._writes = 0
+        self.fingerprint = pipeline_fingerprint()
+        self._entries = OrderedDict()   # key -> encoded bytes
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = metrics.Counter("ocr_cache_hits_total", "Recognition results served from the cache")
+        self.misses = metrics.Counter("ocr_cache_misses_total", "Recognition requests that missed the cache")
+        metrics.Gauge("ocr_cache_hit_ratio", "Cache hits / lookups since start", self.hit_ratio)
+        metrics.Gauge("ocr_cache_bytes", "Encoded size of the in-memory cache tier", lambda: self._size)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, image_bytes: bytes, **params) -> str:
+        h = hashlib.sha256(image_bytes)
+        h.update(json.dumps(params, sort_keys=True).encode())
+        h.update(self.fingerprint.encode())
+        return h.hexdigest()
+
+    def hit_ratio(self):
+        total = self.hits.value + self.misses.value
+        return self.hits.value / total if total else 0.0
+
+    def peek(self, key):
+        """The memory tier's entry for key, or None; never touches the disk."""
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits.inc()
+            return encoded
+
+    def get(self, key):
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits.inc()
+                return encoded
+        encoded = self._read_disk(key)
+        if encoded is None:
+            self.misses.inc()
+            return None
+        self._put_memory(key, encoded)
+        self.hits.inc()
+        return encoded
+
+    def put(self, key, encoded: bytes):
+        self._put_memory(key, encoded)
+        self._write_disk(key, encoded)
+
+    def _put_memory(self, key, encoded):
+        size = len(encoded)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = encoded
+            self._size += size
+            # evict least recently used until under budget
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                encoded = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)   # mtime is the entry's last use for pruning
+        except OSError:
+            pass
+        return encoded
+
+    def _write_disk(self, key, encoded):
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write to a temp file and rename so other workers never read a partial entry
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+        self._writes += 1
+        if self._writes % _PRUNE_EVERY == 0:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Drop disk entries unused for max_age, then the oldest until under disk_max_bytes."""
+        if not self.directory:
+            return
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*", "*.json")):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue   # another worker pruned it
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            expired = self.max_age and now - mtime > self.max_age
+            if not expired and not (self.disk_max_bytes and total > self.disk_max_bytes):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,128 @@
+import json
+import os
+
+# Service settings. Every value can be overridden with an environment
+# variable of the same name, e.g. OCR_WORKERS=4 uvicorn app:app, or set in the
+# JSON file named by OCR_CONFIG (written by `python -m ocr.tune`); the
+# environment wins over the file.
+
+OCR_CONFIG = os.environ.get("OCR_CONFIG") or "ocr_config.json"
+
+
+def _load_file(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+_FILE = _load_file(OCR_CONFIG)
+
+
+def _get(name, default, cast=str):
+    raw = os.environ.get(name)
+    if raw is None or str(raw).strip() == "":
+        raw = _FILE.get(name)
+    if raw is None or str(raw).strip() == "":
+        return default
+    try:
+        return cast(raw)
+    except Exception:
+        return default
+
+
+# number of recognition worker processes (0 -> one per CPU)
+OCR_WORKERS = _get("OCR_WORKERS", 0, int) or (os.cpu_count() or 1)
+# "process" (default) or "thread"; threads suit the tesserocr engine, which releases the GIL
+OCR_POOL_TYPE = _get("OCR_POOL_TYPE", "process").lower()
+# OpenMP threads per tesseract (0 -> tesseract's default, all cores). Exported
+# here, before any engine is loaded, so worker processes and tesseract children
+# inherit it; one thread per worker usually beats workers fighting over cores.
+OCR_OMP_THREAD_LIMIT = _get("OCR_OMP_THREAD_LIMIT", 0, int)
+if OCR_OMP_THREAD_LIMIT:
+    os.environ["OMP_THREAD_LIMIT"] = str(OCR_OMP_THREAD_LIMIT)
+
+# durable job queue (POST /jobs)
+OCR_JOBS_DB = _get("OCR_JOBS_DB", "ocr_jobs.sqlite3")
+OCR_JOB_MAX_ATTEMPTS = _get("OCR_JOB_MAX_ATTEMPTS", 3, int)
+# seconds a claimed job stays leased to a worker before another may retake it
+OCR_JOB_LEASE = _get("OCR_JOB_LEASE", 300.0, float)
+OCR_JOB_RETRY_DELAY = _get("OCR_JOB_RETRY_DELAY", 5.0, float)
+OCR_JOB_POLL_INTERVAL = _get("OCR_JOB_POLL_INTERVAL", 1.0, float)
+
+# result cache: in-memory LRU (bytes budget) plus optional shared disk tier
+OCR_CACHE_MAX_BYTES = _get("OCR_CACHE_MAX_BYTES", 64 * 1024 * 1024, int)
+OCR_CACHE_DIR = _get("OCR_CACHE_DIR", None)
+# disk tier bounds: total entry size, and seconds since last use before an entry is dropped (0: unbounded)
+OCR_CACHE_DISK_MAX_BYTES = _get("OCR_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024, int)
+OCR_CACHE_MAX_AGE = _get("OCR_CACHE_MAX_AGE", 7 * 24 * 3600.0, float)
+# bump to invalidate cached results when the pipeline changes outside the ocr sources
+OCR_PIPELINE_VERSION = _get("OCR_PIPELINE_VERSION", "1")
+
+# seconds a single /extract caller waits for its result (0 -> no limit)
+OCR_REQUEST_TIMEOUT = _get("OCR_REQUEST_TIMEOUT", 0.0, float) or None
+
+# admission control: concurrent recognitions (0 -> OCR_WORKERS) and bounded wait queue
+OCR_MAX_CONCURRENT = _get("OCR_MAX_CONCURRENT", 0, int) or OCR_WORKERS
+OCR_MAX_QUEUE = _get("OCR_MAX_QUEUE", 32, int)
+
+# languages preloaded (and run once on a synthetic card) by every worker at startup
+OCR_LANGS = [l.strip() for l in _get("OCR_LANGS", "eng").split(",") if l.strip()]
+OCR_WARMUP = _get("OCR_WARMUP", 1, int)
+
+# OCR engine: "tesserocr" keeps initialised tesseract API handles alive in-process,
+# "pytesseract" forks the tesseract binary per call, "auto" prefers tesserocr if installed
+OCR_ENGINE = _get("OCR_ENGINE", "auto").lower()
+OCR_TESSDATA = _get("OCR_TESSDATA", None)
+# idle API handles kept per (lang, psm); raised to OCR_REGION_THREADS when lower,
+# so concurrent region passes reuse their handles
+OCR_ENGINES_PER_KEY = _get("OCR_ENGINES_PER_KEY", 2, int)
+
+# pytesseract analysis: a first pass at least this confident is taken as upright
+# and skips the separate OSD run
+OCR_UPRIGHT_MIN_CONF = _get("OCR_UPRIGHT_MIN_CONF", 60.0, float)
+OCR_UPRIGHT_MIN_WORDS = _get("OCR_UPRIGHT_MIN_WORDS", 3, int)
+
+# page segmentation modes tried in order, cheapest first (6: one text block,
+# 11: sparse text, 3: full layout); later ones only run while a pass stays below
+# the thresholds. Empty -> tesseract's default, one pass.
+OCR_PSM_CASCADE = [int(p) for p in _get("OCR_PSM_CASCADE", "6,11,3").split(",") if p.strip().isdigit()]
+OCR_CASCADE_MIN_CONF = _get("OCR_CASCADE_MIN_CONF", 70.0, float)
+OCR_CASCADE_MIN_WORDS = _get("OCR_CASCADE_MIN_WORDS", 4, int)
+
+# per-region OCR: find text lines with morphology and OCR the crops in parallel
+# before falling back to whole-page passes. "auto" -> only with the tesserocr engine
+OCR_REGIONS = _get("OCR_REGIONS", "auto").lower()
+OCR_REGION_THREADS = _get("OCR_REGION_THREADS", 4, int)
+# pixels of margin kept around each detected line
+OCR_REGION_PAD = _get("OCR_REGION_PAD", 6, int)
+
+# re-read phone / fax / PIN spans from small crops restricted to these characters
+OCR_DIGIT_REFINE = _get("OCR_DIGIT_REFINE", 1, int)
+OCR_DIGIT_WHITELIST = _get("OCR_DIGIT_WHITELIST", "0123456789+-().")
+
+# preprocessing scale: images are resized so the median glyph is about this many
+# pixels tall (shrinking phone photos, enlarging thumbnails), within these bounds;
+# when no text height can be measured the long side is brought to OCR_FALLBACK_SIDE
+OCR_TEXT_HEIGHT = _get("OCR_TEXT_HEIGHT", 30.0, float)
+OCR_SCALE_MIN = _get("OCR_SCALE_MIN", 0.2, float)
+OCR_SCALE_MAX = _get("OCR_SCALE_MAX", 3.0, float)
+OCR_FALLBACK_SIDE = _get("OCR_FALLBACK_SIDE", 2000, int)
+# find the card outline in photos and warp just the card upright before thresholding
+OCR_CARD_DETECT = _get("OCR_CARD_DETECT", 1, int)
+
+# run tesseract from the server's event loop as killable asyncio subprocesses
+# (workers only preprocess and build the result): "auto" -> when tesserocr is
+# not in use, since in-process handles cannot be killed
+OCR_ASYNC_ENGINE = _get("OCR_ASYNC_ENGINE", "auto").lower()
+# seconds of tesseract time a single card may use before its processes are killed (0 -> no limit)
+OCR_ENGINE_TIMEOUT = _get("OCR_ENGINE_TIMEOUT", 60.0, float) or None
+
+# OCR backend used by Recognize: "tesseract", or "stub" to replay the recorded
+# TSV fixtures in OCR_STUB_FIXTURES (no tesseract needed; for benchmarks and load tests)
+OCR_BACKEND = _get("OCR_BACKEND", "tesseract").lower()
+OCR_STUB_FIXTURES = _get("OCR_STUB_FIXTURES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+# seconds each stub pass sleeps, to stand in for engine time
+OCR_STUB_LATENCY = _get("OCR_STUB_LATENCY", 0.0, float)
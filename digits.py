@@ -0,0 +1,97 @@
+import re
+
+import numpy as np
+
+from ocr.config import OCR_DIGIT_WHITELIST, OCR_REGION_PAD
+from ocr.regions import crop, LINE_PSM
+
+# Refinement pass for numbers: phone, fax and PIN/ZIP words come back from a
+# full-page pass with O/0, l/1, S/5 confusions. Only the numeric span of those
+# lines is cropped and read again as a single line restricted to digits and
+# phone punctuation, and the result is written back over the original words.
+
+# letters tesseract commonly returns for digits
+_CONFUSABLE = set("OoDQlIi|SsBZzg")
+_PUNCT = set("+-().,/")
+_NOT_NUMERIC_LINE = re.compile(r'@|www\.|https?://', re.I)
+
+
+def _numeric_like(word):
+    """Mostly digits, allowing phone punctuation and digit look-alikes."""
+    digits = sum(ch.isdigit() for ch in word)
+    if not digits:
+        return False
+    fuzzy = sum(ch.isdigit() or ch in _CONFUSABLE or ch in _PUNCT for ch in word)
+    return fuzzy / len(word) >= 0.75
+
+
+def _digit_count(text):
+    return sum(ch.isdigit() for ch in text)
+
+
+def _fuzzy_digit_count(text):
+    return sum(ch.isdigit() or ch in _CONFUSABLE for ch in text)
+
+
+def candidates(table):
+    """
+    (rows, text) for each numeric span worth re-reading: a run of adjacent
+    numeric-like words holding at least 5 (possibly misread) digits (phone, fax, PIN/ZIP), on
+    lines that are not emails or websites.
+    """
+    words = table.words()
+    out = []
+    for rows in table.line_rows():
+        if _NOT_NUMERIC_LINE.search(" ".join(words[r] for r in rows)):
+            continue
+        run = []
+        for r in list(rows) + [None]:
+            if r is not None and _numeric_like(words[r]):
+                run.append(r)
+                continue
+            text = " ".join(words[i] for i in run)
+            if run and _fuzzy_digit_count(text) >= 5:
+                out.append((run, text))
+            run = []
+    return out
+
+
+def _padded(box, shape, pad):
+    x, y, w, h = box
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    x1, y1 = min(shape[1], x + w + pad), min(shape[0], y + h + pad)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def plan(img, table, lang):
+    """
+    Analysis-plan step (see tesseract_driver.plan): re-read the numeric spans
+    of table (recognised from img) with a digit whitelist and psm 7, as one
+    concurrent batch. A re-read replaces the span only if it keeps at least as
+    many digits. Returns (table, number of spans replaced).
+    """
+    spans = candidates(table)
+    if not spans:
+        return table, 0
+    shape = img.shape if isinstance(img, np.ndarray) else (img.size[1], img.size[0])
+    variables = {"tessedit_char_whitelist": OCR_DIGIT_WHITELIST}
+    requests = [("data", crop(img, _padded(table.box(rows), shape, OCR_REGION_PAD)), lang, LINE_PSM, variables)
+                for rows, _ in spans]
+    try:
+        rereads = yield ("batch", requests)
+    except Exception:
+        # refinement is best effort; keep the page pass
+        return table, 0
+    replacements = {}
+    replaced = 0
+    for (rows, text), words in zip(spans, rereads):
+        reread = " ".join(w for w in words.words() if w)
+        if not reread or _digit_count(reread) < _digit_count(text):
+            continue
+        replacements[int(rows[0])] = reread
+        for r in rows[1:]:
+            replacements[int(r)] = ""
+        replaced += 1
+    if not replaced:
+        return table, 0
+    return table.with_words(replacements), replaced
@@ -0,0 +1,137 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+from ocr.config import OCR_ENGINE, OCR_TESSDATA, OCR_ENGINES_PER_KEY, OCR_REGION_THREADS
+
+try:
+    from tesserocr import PyTessBaseAPI, PSM
+except ImportError:
+    # optional: without tesserocr the driver falls back to pytesseract
+    PyTessBaseAPI = None
+    PSM = None
+
+
+def enabled():
+    if OCR_ENGINE == "pytesseract":
+        return False
+    return PyTessBaseAPI is not None
+
+
+class EnginePool:
+    """
+    Initialised tesseract API handles kept alive per (lang, psm, variables),
+    so the traineddata is loaded once per process instead of once per call.
+    Handles are checked out exclusively; at most max_idle per key are kept,
+    never fewer than OCR_REGION_THREADS: a region or digit batch checks out
+    that many line handles at once, and ending the surplus would reload the
+    traineddata on every card.
+    Variables are part of the key because SetVariable outlives Clear().
+    """
+
+    def __init__(self, path=None, max_idle=None):
+        self.path = path or OCR_TESSDATA
+        self.max_idle = max(max_idle or OCR_ENGINES_PER_KEY, OCR_REGION_THREADS)
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _create(self, lang, psm, variables):
+        kwargs = {"lang": lang, "psm": psm}
+        if self.path:
+            kwargs["path"] = self.path
+        api = PyTessBaseAPI(**kwargs)
+        for name, value in variables:
+            api.SetVariable(name, value)
+        return api
+
+    @contextmanager
+    def acquire(self, lang="eng", psm=None, variables=None):
+        psm = PSM.AUTO if psm is None else psm
+        variables = tuple(sorted((k, str(v)) for k, v in (variables or {}).items()))
+        key = (lang, int(psm), variables)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            api = idle.pop() if idle else None
+        if api is None:
+            api = self._create(lang, psm, variables)
+        try:
+            yield api
+        finally:
+            api.Clear()
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(api)
+                    api = None
+            if api is not None:
+                api.End()
+
+    def close(self):
+        with self._lock:
+            apis = [a for idle in self._idle.values() for a in idle]
+            self._idle.clear()
+        for api in apis:
+            api.End()
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = EnginePool()
+    return _pool
+
+
+def _set_image(api, img):
+    """Hand raw pixels to tesseract (no temp file, no PNG round trip)."""
+    if isinstance(img, Image.Image):
+        if img.mode not in ("L", "RGB"):
+            img = img.convert("RGB")
+        arr = np.asarray(img)
+    else:
+        arr = np.ascontiguousarray(img)
+    h, w = arr.shape[:2]
+    bpp = 1 if arr.ndim == 2 else arr.shape[2]
+    api.SetImageBytes(arr.tobytes(), w, h, bpp, w * bpp)
+
+
+def image_to_tsv(img, lang="eng", psm=None, variables=None):
+    """Tesseract TSV text for img (no header row), see ocr.wordtable."""
+    with get_pool().acquire(lang, psm, variables) as api:
+        _set_image(api, img)
+        api.Recognize()
+        return api.GetTSVText(0) or ""
+
+
+def osd_rotation(img):
+    """Degrees to rotate img to upright, same meaning as 'Rotate:' in image_to_osd."""
+    with get_pool().acquire("osd", PSM.OSD_ONLY) as api:
+        _set_image(api, img)
+        osd = api.DetectOrientationScript()
+    if not osd:
+        return 0
+    return (360 - int(osd.get("orient_deg", 0))) % 360
+
+
+def analyze(img, lang="eng"):
+    """
+    One PSM.AUTO_OSD run: (rotation, tsv). Orientation comes from the layout of
+    the same pass that produced the words, so no separate OSD handle is used.
+    """
+    with get_pool().acquire(lang, PSM.AUTO_OSD) as api:
+        _set_image(api, img)
+        api.Recognize()
+        tsv = api.GetTSVText(0) or ""
+        rotation = 0
+        it = api.GetIterator()
+        if it is not None:
+            try:
+                orientation = int(it.Orientation()[0])   # PAGE_UP/RIGHT/DOWN/LEFT
+                rotation = (360 - orientation * 90) % 360
+            except Exception:
+                rotation = 0
+    return rotation, tsv
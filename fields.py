@@ -0,0 +1,37 @@
+from typing import FrozenSet, Optional
+
+# response fields a caller can ask for with fields=...; language_detected is always returned
+FIELDS = (
+    "name", "designation", "company", "email", "mobile", "website",
+    "address", "lines", "confidence", "osd_rotation", "osd",
+)
+
+# fields that need tesseract text at all (the rest come from OSD or the request)
+TEXT_FIELDS = frozenset(FIELDS) - {"osd_rotation", "osd"}
+
+# fields read from phone / PIN digits, which the digit-whitelisted re-read corrects
+DIGIT_FIELDS = frozenset({"mobile", "address", "lines"})
+
+
+def needs_text(fields: Optional[FrozenSet[str]], include_raw: bool = False) -> bool:
+    """True when the request needs a tesseract text pass, not just OSD."""
+    return include_raw or fields is None or bool(fields & TEXT_FIELDS)
+
+
+def needs_digits(fields: Optional[FrozenSet[str]]) -> bool:
+    """True when a requested field depends on the digit re-read (see ocr.digits)."""
+    return fields is None or bool(fields & DIGIT_FIELDS)
+
+
+def parse_fields(spec: Optional[str]) -> Optional[FrozenSet[str]]:
+    """
+    Parse a comma separated fields= value. None / empty means every field.
+    Raises ValueError for unknown names.
+    """
+    if spec is None or not str(spec).strip():
+        return None
+    wanted = frozenset(f.strip().lower() for f in str(spec).split(",") if f.strip())
+    unknown = wanted - set(FIELDS) - {"language_detected"}
+    if unknown:
+        raise ValueError("unknown fields: " + ", ".join(sorted(unknown)))
+    return wanted
@@ -1,6 +1,6 @@
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.responses import JSONResponse
-from ocr.recognition import Recognize
+from ocr.workers import RecognitionPool
 import traceback
 import math
 import json
@@ -99,7 +99,12 @@ def sanitize(obj):
 
 app = FastAPI(title="Visiting Card OCR API")
 
-recognizer = Recognize()
+# recognition runs in worker processes, each with its own Recognize instance
+pool = RecognitionPool()
+
+@app.on_event("shutdown")
+def shutdown():
+    pool.shutdown()
 
 @app.get("/health")
 def health():
@@ -112,7 +117,7 @@ async def extract(file: UploadFile = File(...), lang: str = Form("eng")):
         image_bytes = await file.read()
         if not image_bytes:
             return JSONResponse({"detail": "provide file"}, status_code=400)
-        result= recognizer.recognize(image_bytes, lang=lang)
+        result= await pool.recognize(image_bytes, lang=lang)
         safe= sanitize(result)
         return JSONResponse(content= safe)
     except Exception as e:
@@ -1,10 +1,11 @@
 import re
-from . import tesseract_driver as driver
-from statistics import mean
 from ocr.preprocess import preprocess_image
-from ocr.tesseract_driver import run_tesseract_data, get_osd_rotation
-from ocr.heuristics import pick_name_company
+from ocr import metrics
+from ocr.fields import needs_text
+from ocr.backends import get_backend
+from ocr.orientation import exif_rotation
 import math
+import time
 from typing import List, Dict, Any
 import phonenumbers   # pip install phonenumbers
 import numpy as np
@@ -178,92 +179,62 @@ def _line_has_address_hint(line: str) -> bool:
         return True
     return False
 
-def _avg_confidence_from_raw(raw):
-    # raw is the tesseract image_to_data dict
-    confs = raw.get('conf', []) if isinstance(raw, dict) else []
-    vals = []
-    for c in confs:
-        try:
-            ci = float(c)
-            if ci >= 0:
-                vals.append(ci)
-        except Exception:
-            continue
-    return float(mean(vals)) if vals else 0.0
-
 class Recognize:
-    def __init__(self):                       # <<< FIX: constructor name corrected
-        pass
-
-    def extract(self, image_bytes, lang="eng"):
-        try:
-            osd_rotation = driver.get_osd_rotation(image_bytes)
-        except Exception:
-            osd_rotation = 0
-        
-        pre= preprocess_image(image_bytes)
-        # --- DEBUG CHECK: ensure tesseract output is correct ---
-        try:
-            if hasattr(driver, "run_tesseract_data"):
-                data = driver.run_tesseract_data(pre, lang=lang)
-            else:
-                data = run_tesseract_data(pre, lang=lang)
-
-            print("DEBUG: run_tesseract_data type:", type(data))
-            if isinstance(data, dict):
-                print("DEBUG: keys:", list(data.keys()))
-                for k in ("text", "left", "top", "width", "height", "conf", "raw"):
-                    if k in data:
-                        v = data[k]
-                        if isinstance(v, (list, tuple)):
-                            print(f"DEBUG: len({k}) =", len(v))
-                        else:
-                            print(f"DEBUG: {k} type =", type(v))
-            else:
-                print("DEBUG: NOT A DICT:", data)
-
-        except Exception as e:
-            print("ERROR in tesseract:", repr(e))
-            data = {}
-        # --- END DEBUG ---
-
-
-        data= run_tesseract_data(pre)
-        # ========== DEBUG: dump tesseract outputs (temporary) ==========
-        try:
-            print("DEBUG: run_tesseract_data type:", type(data))
-            print("DEBUG: keys:", list(data.keys()))
-            txt_list = data.get("text", [])
-            conf_list = data.get("conf", [])
-            raw = data.get("raw", {})
-            print("DEBUG: len(text) =", len(txt_list))
-            print("DEBUG: len(conf) =", len(conf_list))
-            # print first 12 text/conf items for inspection
-            for i, t in enumerate(txt_list[:12]):
-                c = conf_list[i] if i < len(conf_list) else None
-                print(f"DEBUG: text[{i!s}]: {repr(t)}  conf[{i!s}]: {repr(c)}")
-            # if there is a 'raw' or nested 'text' in raw, print keys
-            if isinstance(raw, dict):
-                print("DEBUG: raw keys:", list(raw.keys()))
-                if "text" in raw:
-                    print("DEBUG: first 6 raw['text']:", [repr(x) for x in raw.get("text", [])[:6]])
-        except Exception as _dbg_e:
-            print("DEBUG: error dumping tesseract data:", _dbg_e)
-        # ==============================================================
-        lines= data["text"]
-        confs= data["conf"]
-
-        name, company= pick_name_company(lines, confs)
-
-        data = driver.run_tesseract_data(image_bytes, lang=lang)
+    def __init__(self, backend=None):          # <<< FIX: constructor name corrected
+        # OCR engine behind extract(); see ocr.backends (OCR_BACKEND)
+        self.backend = get_backend(backend) if backend is None or isinstance(backend, str) else backend
+
+    def prepare(self, image_bytes):
+        """Preprocessed image for an engine run outside this object (see extract's analysis=)."""
+        with metrics.stage("preprocess_image"):
+            return preprocess_image(image_bytes)
+
+    def extract(self, image_bytes, lang="eng", fields=None, include_raw=False, analysis=None):
+        """
+        fields: optional set of response keys to compute (see ocr.fields.FIELDS);
+        None means all. Stages no requested field depends on are skipped, and the
+        tesseract "raw" dict is only returned when include_raw is set.
+        analysis: a backend analyze() result computed elsewhere (e.g. by
+        ocr.async_driver on the prepare() output); skips preprocessing and tesseract.
+        """
+        want = lambda f: fields is None or f in fields
+
+        osd_rotation = 0
+        orientation_method = "default"
+        data = {}
+        if analysis is None and needs_text(fields, include_raw):
+            pre = self.prepare(image_bytes)
+
+            # orientation and words from one tesseract analysis of the preprocessed
+            # image; it is only rotated and re-run when it is not upright
+            with metrics.stage("run_tesseract_data"):
+                analysis = self.backend.analyze(pre, lang=lang, fields=fields)
+        if analysis is not None:
+            data = analysis
+            # prepare() already applied the EXIF orientation; report the turn from the upload
+            exif = exif_rotation(image_bytes) or 0
+            osd_rotation = (exif + data.get("rotation", 0)) % 360
+            orientation_method = data.get("orientation_method", "default")
+            if exif and not data.get("rotation", 0) % 360:
+                orientation_method = "exif"
+        elif want("osd_rotation"):
+            with metrics.stage("get_osd_rotation"):
+                try:
+                    osd_rotation, orientation_method = self.backend.orientation(image_bytes)
+                except Exception:
+                    osd_rotation = 0
+
         # data expected structure:
         # data["text"] -> list of lines (strings)
+        # data["conf"] -> mean word confidence per line (computed by the driver)
         # data["raw"]  -> raw tesseract image_to_data dict (with 'conf' etc)
         lines_raw = data.get("text", []) or []
         raw = data.get("raw", {}) or {}
+        metrics.WORDS_RECOGNISED.inc(sum(1 for t in raw.get("text", []) if t))
 
+        t_lines = time.perf_counter()
         # build lines with confidences (if available)
-        conf_list = raw.get("conf", [])
+        conf_list = data.get("conf", [])
         structured_lines = []
         for i, txt in enumerate(lines_raw):
             c = None
@@ -272,24 +243,24 @@ class Recognize:
             except Exception:
                 c = None
             # clean the raw OCR text into a safe, human string
-        clean_txt = robust_str(txt).strip()
+            clean_txt = robust_str(txt).strip()
 
-        # remove literal 'nan ' prefix or other literal tokens at start
-        if clean_txt.lower().startswith('nan '):
-            clean_txt = clean_txt[4:].strip()
+            # remove literal 'nan ' prefix or other literal tokens at start
+            if clean_txt.lower().startswith('nan '):
+                clean_txt = clean_txt[4:].strip()
 
-        # if the whole token is a literal null-like string, make it empty
-        if clean_txt.lower() in ('nan', 'none', 'null'):
-            clean_txt = ''
+            # if the whole token is a literal null-like string, make it empty
+            if clean_txt.lower() in ('nan', 'none', 'null'):
+                clean_txt = ''
 
-        # normalize multiple internal whitespace and remove stray repeated punctuation
-        clean_txt = re.sub(r'\s+', ' ', clean_txt).strip()
+            # normalize multiple internal whitespace and remove stray repeated punctuation
+            clean_txt = re.sub(r'\s+', ' ', clean_txt).strip()
 
-        structured_lines.append({
-           "idx": i,
-           "text": clean_txt,
-            "conf": c or 0.0
-        })
+            structured_lines.append({
+                "idx": i,
+                "text": clean_txt,
+                "conf": c or 0.0
+            })
 
         # ----- CLEAN & NORMALIZE TEXT LINES (small fixes, keep original vars) -----
         import unicodedata
@@ -297,6 +268,10 @@ class Recognize:
         _leading_nan_re = re.compile(r'^(?:nan|none|null|nan,|\-)+\s*', re.I)  # remove leading nan/null junk
         _nonprint_re = re.compile(r'[\x00-\x1f\x7f]+')  # control chars
 
+        is_email = lambda s: EMAIL_RE.search(s) is not None
+        is_phone = lambda s: PHONE_RE.search(s) is not None
+        is_website = lambda s: WEBSITE_RE.search(s) is not None
+
         for ln in structured_lines:
             txt = ln.get("text", "") or ""
             # normalize unicode and remove control chars
@@ -342,40 +317,36 @@ class Recognize:
             except Exception:
                 ln["conf"] = 0.0
 
-            ln["text"] = txt
-            ln["clean_words"] = [w.strip(".,;:!()[]") for w in txt.split() if w.strip(".,;:!()[]")]
-
             # update ln text to cleaned result
+            s = txt
             ln["text"] = s
-            is_email= lambda s: EMAIL_RE.search(s) is not None
-            is_phone= lambda s: PHONE_RE.search(s) is not None
-            is_website= lambda s: WEBSITE_RE.search(s) is not None
-            looks_like_address= looks_like_address
 
             # now compute flags / clean_words using cleaned text
             ln["is_contact"] = bool(is_email(s) or is_phone(s) or is_website(s))
             ln["is_address_hint"] = bool(looks_like_address(s))
             ln["clean_words"] = [w.strip(".,") for w in s.split() if w.strip(".,")]
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - t_lines, "line_grouping")
 
+        t_fields = time.perf_counter()
         # extract contact info first
         found_email = None
         found_phone = None
         found_website = None
         for ln in structured_lines:
             s = ln["text"] or ""
-            if not found_email and is_email(s):
+            if not found_email and want("email") and is_email(s):
                 m= EMAIL_RE.search(s)
                 if m:
                     found_email = m.group(0)
-            if not found_phone and is_phone(s):
+            if not found_phone and want("mobile") and is_phone(s):
                 found_phone = _clean_phone(PHONE_RE.search(s).group(0))
-            if not found_website and is_website(s):
+            if not found_website and want("website") and is_website(s):
                 found_website = WEBSITE_RE.search(s).group(0)
 
         # find contiguous address block starting from any address hint near bottom
         # find contiguous address block starting from any address hint near bottom
         address_lines = []
-        if structured_lines:
+        if structured_lines and want("address"):
             # find lines that look like address hints
             address_hints = [ln for ln in structured_lines if ln.get("is_address_hint")]
             if address_hints:
@@ -432,8 +403,9 @@ class Recognize:
                         address_lines = candidates[-3:]
 
         # find designation (anywhere)
+        # (company needs name and designation to rule those lines out)
         designation = None
-        for ln in structured_lines:
+        for ln in (structured_lines if want("designation") or want("company") else []):
             low = ln["text"].lower()
             if any(k in low for k in DESIGNATION_KEYWORDS):
                 designation = ln["text"]
@@ -443,7 +415,7 @@ class Recognize:
         name_candidate = None
         # heuristics: short (2-3 words), TitleCase words (start with uppercase), no digits, not contact, not address
         possible = []
-        for ln in structured_lines:
+        for ln in (structured_lines if want("name") or want("company") else []):
             s = ln["text"]
             if not s or ln["is_contact"] or ln["is_address_hint"]:
                 continue
@@ -462,7 +434,7 @@ class Recognize:
 
         # company candidate: first non-contact/non-address line near the top if not name
         company_candidate = None
-        for ln in structured_lines:
+        for ln in (structured_lines if want("company") else []):
             s = ln["text"]
             if not s or ln["is_contact"] or ln["is_address_hint"]:
                 continue
@@ -487,82 +459,57 @@ class Recognize:
             "website": found_website or "",
             "address": "\n".join(address_lines).strip(),
             "lines": [ln["text"] for ln in structured_lines if (ln.get("text") or "").strip()],
-            "confidence": round(_avg_confidence_from_raw(raw), 2),
+            "confidence": round(data.get("mean_conf", 0.0), 2) if want("confidence") else 0.0,
             
         }
+        if fields is not None:
+            final = {k: v for k, v in final.items() if k == "language_detected" or k in fields}
+        if "osd_rotation" in final:
+            # "exif", "profile", "first_pass", "osd" or "default"; see tesseract_driver.get_orientation
+            final["orientation_method"] = orientation_method
+        if include_raw:
+            final["raw"] = raw
+            # which page segmentation passes ran and which one was kept
+            final["psm"] = data.get("psm")
+            final["cascade"] = data.get("cascade", [])
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - t_fields, "field_heuristics")
         return final
 
-    def recognize(self, image_bytes, lang="eng"):
-        try:
-            img = preprocess_image(image_bytes)   # keep whatever preprocessing you already have
-        except Exception:
-            img = image_bytes
-
-        try:
-            osd = get_osd_rotation(img)
-        except Exception:
-            osd = ""
-
-        # run tesseract to get tsv-style dict (should include keys: text, left, top, width, height, conf)
-        data = run_tesseract_data(img, lang=lang)
-
-        # Build word list for TSV grouping
-        word_data = []
-        texts = data.get("text", [])
-        lefts = data.get("left", [])
-        tops = data.get("top", [])
-        widths = data.get("width", [])
-        heights = data.get("height", [])
-
-        for i, t in enumerate(texts):
-            if not t:
-                continue
-            try:
-                left = int(lefts[i]) if i < len(lefts) else 0
-                top = int(tops[i]) if i < len(tops) else 0
-                width = int(widths[i]) if i < len(widths) else 0
-                height = int(heights[i]) if i < len(heights) else 0
-            except Exception:
-                left = top = width = height = 0
-
-            word_data.append({
-                "text": str(t).strip(),
-                "left": left,
-                "top": top,
-                "width": width,
-                "height": height
-            })
-
-        # Group words into lines using the TSV based helper we added at top-level
-        lines_grouped = group_words_by_line_using_tsv(word_data, gap_tol_px=12)
+    def recognize(self, image_bytes, lang="eng", fields=None, include_raw=False, analysis=None):
+        want = lambda f: fields is None or f in fields
 
-        # convert to the old form expected by your extraction logic, if necessary
-        # If your existing extract_fields accepts list of lines as strings, map accordingly:
-        lines_for_extract = lines_grouped
+        # "osd" is the rotation extract() already measured; no second OSD run
+        wanted = fields
+        if fields is not None and "osd" in fields:
+            wanted = fields | {"osd_rotation"}
 
-        # Now call your existing extract_fields (or the method that extracts name/phone/email)
-        extracted = self.extract(image_bytes, lang=lang)   # <<< FIX: call the existing extract pipeline
+        # the field extraction pipeline (tesseract, line building, heuristics)
+        extracted = self.extract(image_bytes, lang=lang, fields=wanted, include_raw=include_raw, analysis=analysis)
 
         # Clean phone numbers
-        mobile_raw = extracted.get('mobile')
-        if isinstance(mobile_raw, list):
-            extracted['mobile'] = [clean_phone(p) for p in mobile_raw if p]
-        else:
-            # single string -> normalize it
-            extracted['mobile'] = clean_phone(mobile_raw) if mobile_raw else ""
+        if want("mobile"):
+            mobile_raw = extracted.get('mobile')
+            if isinstance(mobile_raw, list):
+                extracted['mobile'] = [clean_phone(p) for p in mobile_raw if p]
+            else:
+                # single string -> normalize it
+                extracted['mobile'] = clean_phone(mobile_raw) if mobile_raw else ""
 
         # Normalize address if you have a helper normalize_address, else simple join
-        addr = extracted.get("address", '')
-        if isinstance(addr, list):
-            extracted['address'] = "\n".join([a for a in addr if a])
-        else:
-            extracted['address'] = addr or ""
+        if want("address"):
+            addr = extracted.get("address", '')
+            if isinstance(addr, list):
+                extracted['address'] = "\n".join([a for a in addr if a])
+            else:
+                extracted['address'] = addr or ""
 
         # Add OSD and other metadata
-        extracted['osd'] = osd
+        if want("osd"):
+            extracted['osd'] = extracted.get('osd_rotation', 0)
+            if not want("osd_rotation"):
+                extracted.pop('osd_rotation', None)
         extracted['language_detected'] = lang
 
-        # Final sanitize to ensure JSON serializability
-        final = sanitize(extracted)
-
-        return final
+        # JSON safety (NaN, numpy types) is handled once by ocr.serializer.dumps
+        # when the response is encoded, so no sanitize pass here.
+        return extracted
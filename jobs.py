@@ -0,0 +1,206 @@
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from ocr import metrics
+from ocr.config import OCR_JOBS_DB, OCR_JOB_MAX_ATTEMPTS, OCR_JOB_LEASE, OCR_JOB_RETRY_DELAY
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    image BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_until REAL,
+    queue_wait REAL NOT NULL DEFAULT 0,
+    run_time REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+"""
+
+# job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Durable job queue stored in a local SQLite file.
+
+    Jobs survive restarts: a job whose worker died stays RUNNING only until its
+    lease expires, after which claim() hands it out again. Failed attempts are
+    retried until max_attempts is reached. queue_wait and run_time are summed
+    over all attempts so waiting and processing time can be reported apart; an
+    attempt whose lease expired counts as running until lease_until.
+
+    claim() returns the attempt's started_at as its token: renew(), complete()
+    and fail() only act while that attempt still holds the job, so a worker
+    that lost its lease cannot requeue or overwrite the attempt that replaced it.
+    """
+
+    def __init__(self, path: str = None, max_attempts: int = None, lease: float = None):
+        self.path = path or OCR_JOBS_DB
+        self.max_attempts = max_attempts or OCR_JOB_MAX_ATTEMPTS
+        self.lease = lease or OCR_JOB_LEASE
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        metrics.Gauge("ocr_jobs_queued", "Jobs waiting in the durable queue", self.depth)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, image_bytes: bytes, lang: str = "eng") -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, lang, image, max_attempts, created_at, available_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, lang, sqlite3.Binary(image_bytes), self.max_attempts, now, now),
+            )
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest runnable job (queued, or running with an expired lease)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # a job that keeps killing its worker must not be handed out forever
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, image = NULL, finished_at = ?, lease_until = NULL,"
+                    " run_time = run_time + (lease_until - started_at)"
+                    " WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                    (FAILED, "worker lease expired", now, RUNNING, now),
+                )
+                row = conn.execute(
+                    "SELECT id, lang, image, status, available_at, started_at, lease_until FROM jobs"
+                    " WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?)"
+                    " ORDER BY available_at LIMIT 1",
+                    (QUEUED, now, RUNNING, now),
+                ).fetchone()
+                if row is not None:
+                    if row["status"] == RUNNING:
+                        # the dead attempt ran until its lease expired; this wait starts there
+                        ran = row["lease_until"] - row["started_at"]
+                        waited_since = row["lease_until"]
+                    else:
+                        ran, waited_since = 0.0, row["available_at"]
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?,"
+                        " lease_until = ?, queue_wait = queue_wait + ?, run_time = run_time + ? WHERE id = ?",
+                        (RUNNING, now, now + self.lease, max(0.0, now - waited_since), max(0.0, ran), row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row["id"], "lang": row["lang"], "image": bytes(row["image"]), "started_at": now}
+
+    def renew(self, job_id: str, started_at: float) -> bool:
+        """Extend the lease of a running attempt; False once it has lost the job."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ? AND started_at = ?",
+                (time.time() + self.lease, job_id, RUNNING, started_at),
+            )
+        return cur.rowcount == 1
+
+    def complete(self, job_id: str, started_at: float, result: Any) -> bool:
+        """
+        result: the JSON response body (bytes/str) or a JSON-serialisable object.
+        Returns False (and records nothing) when the attempt no longer holds the job.
+        """
+        if isinstance(result, (bytes, bytearray)):
+            result = bytes(result).decode("utf-8")
+        elif not isinstance(result, str):
+            result = json.dumps(result)
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, image = NULL, finished_at = ?,"
+                " lease_until = NULL, run_time = run_time + (? - started_at)"
+                " WHERE id = ? AND status = ? AND started_at = ?",
+                (DONE, result, now, now, job_id, RUNNING, started_at),
+            )
+        return cur.rowcount == 1
+
+    def fail(self, job_id: str, started_at: float, error: str) -> bool:
+        """
+        Record a failed attempt; requeue with a delay unless attempts are used up.
+        Returns False (and records nothing) when the attempt no longer holds the job.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # both statements in one transaction, so the attempt count read is the one updated
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ? AND started_at = ?",
+                    (job_id, RUNNING, started_at),
+                ).fetchone()
+                if row is not None and row["attempts"] < row["max_attempts"]:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_until = NULL,"
+                        " run_time = run_time + (? - started_at) WHERE id = ?",
+                        (QUEUED, error, now + OCR_JOB_RETRY_DELAY, now, job_id),
+                    )
+                elif row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, image = NULL, finished_at = ?, lease_until = NULL,"
+                        " run_time = run_time + (? - started_at) WHERE id = ?",
+                        (FAILED, error, now, now, job_id),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row is not None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, lang, attempts, max_attempts, error, created_at, started_at,"
+                " finished_at, queue_wait, run_time FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["queue_wait"] = round(job["queue_wait"], 3)
+        job["run_time"] = round(job["run_time"], 3)
+        return job
+
+    def result(self, job_id: str) -> Optional[str]:
+        """Stored JSON result text of a finished job, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return row["result"]
+
+    def depth(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
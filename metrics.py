@@ -0,0 +1,192 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus text-format metrics, no client library needed.
+# Metrics register themselves in REGISTRY and /metrics serves render().
+#
+# Pipeline stages run inside pool worker processes, so samples recorded there
+# are captured with collect() and shipped back to the server process, which
+# feeds them into its own metrics with replay().
+
+REGISTRY = []
+_BY_NAME = {}
+
+# active sample list while running under collect(), else None
+_collector = contextvars.ContextVar("ocr_metric_samples", default=None)
+
+# seconds; covers a cached hit up to a pathological card
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _fmt(v):
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+def _labels(label_name, label_value, extra=""):
+    parts = []
+    if label_name is not None:
+        parts.append(f'{label_name}="{label_value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    _BY_NAME[metric.name] = metric
+
+
+def _record(metric, value, label_value):
+    samples = _collector.get()
+    if samples is not None:
+        samples.append((metric.name, label_value, value))
+        return True
+    return False
+
+
+class Counter:
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+        _register(self)
+
+    def inc(self, amount=1, label_value=None):
+        if _record(self, amount, label_value):
+            return
+        self._apply(amount, label_value)
+
+    def _apply(self, amount, label_value):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    @property
+    def value(self):
+        return sum(self._values.values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda kv: str(kv[0]))
+        if not values and self.label is None:
+            # an unlabelled counter has one series from the start; a labelled one has none until used
+            values = [(None, 0)]
+        for lv, v in values:
+            lines.append(f"{self.name}{_labels(self.label, lv)} {_fmt(v)}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, name, help_text, fn):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        _register(self)
+
+    def render(self):
+        try:
+            v = float(self.fn())
+        except Exception:
+            v = float("nan")
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_fmt(v) if v == v else 'NaN'}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name, help_text, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        # label value -> [per-bucket counts..., +Inf count], sum
+        self._series = {}
+        self._lock = threading.Lock()
+        _register(self)
+
+    def observe(self, value, label_value=None):
+        if _record(self, value, label_value):
+            return
+        self._apply(value, label_value)
+
+    def _apply(self, value, label_value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(label_value, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[i] += 1
+            self._series[label_value] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda kv: str(kv[0]))
+        for lv, (counts, total) in series:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = f'le="{_fmt(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label, lv, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label, lv)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label, lv)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("ocr_stage_seconds", "Latency of each OCR pipeline stage", label="stage")
+BYTES_PROCESSED = Counter("ocr_bytes_processed_total", "Uploaded image bytes accepted for recognition")
+WORDS_RECOGNISED = Counter("ocr_words_recognised_total", "Words returned by tesseract")
+PSM_SELECTED = Counter("ocr_psm_selected_total", "Recognitions by the page segmentation mode that was kept", label="psm")
+DIGIT_SPANS_REFINED = Counter("ocr_digit_spans_refined_total", "Phone/PIN spans replaced by a digit-whitelisted re-read")
+PREPROCESS_SCALE = Histogram("ocr_preprocess_scale", "Resize factor applied by preprocess_image", label="source",
+                             buckets=(0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0))
+CARDS_CROPPED = Counter("ocr_cards_cropped_total", "Photos cropped and rectified to the detected card outline")
+POOL_RESTARTS = Counter("ocr_pool_restarts_total", "Worker pools rebuilt after a worker process died")
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage into ocr_stage_seconds{stage=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, name)
+
+
+@contextmanager
+def collect():
+    """Capture samples instead of recording them; yields the list to ship to replay()."""
+    samples = []
+    token = _collector.set(samples)
+    try:
+        yield samples
+    finally:
+        _collector.reset(token)
+
+
+def replay(samples):
+    for name, label_value, value in samples or ():
+        metric = _BY_NAME.get(name)
+        if isinstance(metric, Histogram):
+            metric._apply(value, label_value)
+        elif isinstance(metric, Counter):
+            metric._apply(value, label_value)
+
+
+def render():
+    lines = []
+    for m in REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
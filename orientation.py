@@ -0,0 +1,186 @@
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Card orientation without tesseract OSD for most uploads:
+#   1. the EXIF orientation tag of camera photos (preprocess_image applies it)
+#   2. a projection-profile classifier on a thumbnail: text lines run along
+#      the axis whose ink profile alternates sharply between lines and gaps,
+#      and Latin glyphs line up on their baseline far better than at their
+#      tops, which tells upright from upside down
+#   3. tesseract OSD, only when both are inconclusive, on a reduced crop of
+#      the densest text instead of the whole image
+# Rotations use tesseract's "Rotate:" convention: degrees clockwise to upright.
+
+EXIF_ORIENTATION = 0x0112
+# plain rotations only; mirrored orientations (2, 4, 5, 7) are left to the classifier
+_EXIF_ROTATION = {1: 0, 3: 180, 6: 90, 8: 270}
+
+# classifier thumbnail (long side) and decision margins
+_SIDE = 800
+_MIN_INK = 500
+_GLYPH_SHARE = 0.15
+_MIN_GLYPH_SIDE = 4
+_AXIS_RATIO = 1.5
+# up/down vote: lines at least _MIN_LINE_HEIGHT px with _MIN_GLYPHS glyphs,
+# edges within _EDGE_TOL glyph heights counting as aligned, a line voting when
+# its alignments differ by _MIN_LEAN; at least _MIN_LINES voters, fewer than
+# one in _MAX_DISSENT against the majority, and a net balance of _UPRIGHT_MARGIN
+_MIN_LINE_HEIGHT = 8
+_MIN_GLYPHS = 4
+_EDGE_TOL = 0.1
+_MIN_LEAN = 0.1
+_MIN_LINES = 2
+_MAX_DISSENT = 4
+_UPRIGHT_MARGIN = 0.15
+# OSD crop: window share of each side searched for the most ink, and its size limit
+_CROP_SHARE = 0.6
+_CROP_SIDE = 1000
+
+
+def exif_rotation(image_bytes):
+    """Rotation the EXIF orientation tag asks for (0 for tag 1), or None without a usable tag."""
+    try:
+        tag = Image.open(io.BytesIO(image_bytes)).getexif().get(EXIF_ORIENTATION)
+    except Exception:
+        return None
+    return _EXIF_ROTATION.get(tag)
+
+
+def rotate(arr, rotation):
+    """arr rotated clockwise by rotation (a multiple of 90) degrees."""
+    if not rotation % 360:
+        return arr
+    return np.ascontiguousarray(np.rot90(arr, -(rotation // 90)))
+
+
+def _gray(img):
+    arr = np.asarray(img)
+    if arr.ndim == 3:
+        arr = cv2.cvtColor(arr, cv2.COLOR_RGBA2GRAY if arr.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+    return arr
+
+
+def _thumbnail(gray, side):
+    h, w = gray.shape
+    ratio = min(1.0, side / max(h, w))
+    if ratio == 1.0:
+        return gray, ratio
+    return cv2.resize(gray, (max(1, int(w * ratio)), max(1, int(h * ratio))), interpolation=cv2.INTER_AREA), ratio
+
+
+def _ink(gray, glyphs_only=False):
+    # dark text on a light page -> 1 where there is ink
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    if ink.mean() > 0.5:
+        ink = 1 - ink   # light text on a dark card
+    if glyphs_only:
+        # logos, rules and frames would swamp the profiles, and threshold
+        # specks blur the line bands; keep glyph-sized blobs
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        limit = _GLYPH_SHARE * min(ink.shape)
+        side = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+        drop = (side > limit) | (side < _MIN_GLYPH_SIDE)
+        drop[0] = True
+        ink = np.where(drop[labels], 0, ink).astype(np.uint8)
+    return ink
+
+
+def _line_contrast(profile):
+    # across text lines the profile swings between full lines and empty gaps;
+    # along them it stays level: coefficient of variation over the inked span
+    nz = np.flatnonzero(profile)
+    if not len(nz):
+        return 0.0
+    p = profile[nz[0]:nz[-1] + 1].astype(np.float64)
+    return float(p.std() / p.mean())
+
+
+def _aligned(edges, tol):
+    # share of edges within tol of the most common edge position
+    return float(max(np.sum(np.abs(edges - e) <= tol) for e in edges)) / len(edges)
+
+
+def _baseline_vote(ink):
+    """
+    (balance, voters) for horizontal text. Latin glyphs nearly all sit on the
+    baseline, descenders (g, p, y, commas) being few, while their tops split
+    between x-height and the ascender/capital line. So in an upright line
+    glyph bottoms line up better than glyph tops; upside down it is the
+    reverse. Lines where both line up (capitals, digits) abstain. balance
+    is the glyph-weighted mean of bottom minus top alignment, positive for
+    upright, or 0.0 when the voting lines disagree.
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    top = stats[1:, cv2.CC_STAT_TOP]
+    height = stats[1:, cv2.CC_STAT_HEIGHT]
+    bottom = top + height
+    middle = top + height / 2
+    rows = ink.sum(axis=1, dtype=np.int64)
+    on = np.r_[False, rows > 0, False].astype(np.int8)
+    starts, ends = np.flatnonzero(np.diff(on) == 1), np.flatnonzero(np.diff(on) == -1)
+    diff = total = voters = up = 0
+    for a, b in zip(starts, ends):
+        if b - a < _MIN_LINE_HEIGHT:
+            continue   # specks, rules, and text too small to resolve
+        glyphs = (middle >= a) & (middle < b)
+        n = int(glyphs.sum())
+        if n < _MIN_GLYPHS:
+            continue
+        tol = max(1.0, _EDGE_TOL * float(np.median(height[glyphs])))
+        lean = _aligned(bottom[glyphs], tol) - _aligned(top[glyphs], tol)
+        if abs(lean) < _MIN_LEAN:
+            continue
+        diff += lean * n
+        total += n
+        voters += 1
+        up += lean > 0
+    if not voters or min(up, voters - up) * _MAX_DISSENT > voters:
+        return 0.0, voters
+    return diff / total, voters
+
+
+def classify(img):
+    """
+    (rotation, confident) for a page image (grayscale or binarized array,
+    RGB array or PIL image), from a thumbnail. confident is False when the
+    text axis or its direction cannot be told apart reliably.
+    """
+    small, _ = _thumbnail(_gray(img), _SIDE)
+    ink = _ink(small, glyphs_only=True)
+    if ink.sum() < _MIN_INK:
+        return 0, False
+    across_rows = _line_contrast(ink.sum(axis=1, dtype=np.int64))
+    across_cols = _line_contrast(ink.sum(axis=0, dtype=np.int64))
+    if max(across_rows, across_cols) < _AXIS_RATIO * min(across_rows, across_cols):
+        return 0, False
+    if across_rows > across_cols:
+        base, lines_ink = 0, ink
+    else:
+        # vertical lines: a quarter turn counter-clockwise lays them flat
+        base, lines_ink = 270, np.rot90(ink)
+    balance, voters = _baseline_vote(lines_ink)
+    if voters < _MIN_LINES or abs(balance) < _UPRIGHT_MARGIN:
+        return 0, False
+    return (base if balance > 0 else base + 180) % 360, True
+
+
+def dense_crop(img):
+    """
+    The window (_CROP_SHARE of each side) of img holding the most ink,
+    reduced to at most _CROP_SIDE pixels: enough text for OSD at a fraction
+    of the full image.
+    """
+    gray = _gray(img)
+    small, ratio = _thumbnail(gray, _SIDE)
+    ink = _ink(small).astype(np.float32)
+    wh, ww = max(1, int(small.shape[0] * _CROP_SHARE)), max(1, int(small.shape[1] * _CROP_SHARE))
+    density = cv2.boxFilter(ink, -1, (ww, wh), normalize=False, borderType=cv2.BORDER_CONSTANT)
+    cy, cx = np.unravel_index(int(density.argmax()), density.shape)
+    y0 = min(max(0, cy - wh // 2), small.shape[0] - wh)
+    x0 = min(max(0, cx - ww // 2), small.shape[1] - ww)
+    y0, x0, h, w = int(y0 / ratio), int(x0 / ratio), int(wh / ratio), int(ww / ratio)
+    crop, _ = _thumbnail(gray[y0:y0 + h, x0:x0 + w], _CROP_SIDE)
+    return np.ascontiguousarray(crop)
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from ocr.config import OCR_REGION_THREADS, OCR_REGION_PAD
+from ocr.wordtable import WordTable
+
+# Cards are mostly background, so instead of one tesseract pass over the whole
+# (2x enlarged) page, find the text lines with morphology, OCR each crop as a
+# single line (psm 7) concurrently and stitch the words back into page
+# coordinates as one ocr.wordtable.WordTable.
+
+LINE_PSM = 7
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # tesserocr releases the GIL and pytesseract waits on a subprocess,
+        # so threads are enough to keep several crops in flight
+        _executor = ThreadPoolExecutor(max_workers=OCR_REGION_THREADS, thread_name_prefix="ocr-region")
+    return _executor
+
+
+def _gray(img):
+    arr = np.asarray(img)
+    if arr.ndim == 3:
+        arr = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+        _, arr = cv2.threshold(arr, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return arr
+
+
+def find_regions(img, pad=None):
+    """
+    Bounding boxes (x, y, w, h) of text lines in a dark-text-on-light image,
+    top to bottom then left to right. Characters are merged into lines by a
+    wide, flat dilation; blobs that cannot be text (specks, big square logos)
+    are dropped.
+    """
+    pad = OCR_REGION_PAD if pad is None else pad
+    arr = _gray(img)
+    h, w = arr.shape[:2]
+    ink = cv2.bitwise_not(arr)
+    # drop isolated specks left by adaptive thresholding
+    ink = cv2.morphologyEx(ink, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, w // 40), 3))
+    merged = cv2.dilate(ink, kernel, iterations=1)
+    contours = cv2.findContours(merged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+
+    boxes = []
+    for c in contours:
+        x, y, bw, bh = cv2.boundingRect(c)
+        if bh < 8 or bw < 8:
+            continue
+        if bh > h * 0.3 and bw < bh * 1.5:
+            # tall, squarish: a logo or photo, not a line of text
+            continue
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(w, x + bw + pad), min(h, y + bh + pad)
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+    # a fragment the dilation did not join (dot of an i, accent) can end up
+    # inside a line's padded box; OCRing it again would duplicate words
+    boxes = [b for b in boxes if not any(o is not b and _contains(o, b) for o in boxes)]
+    boxes.sort(key=lambda b: (b[1], b[0]))
+    return boxes
+
+
+def _contains(outer, inner):
+    ox, oy, ow, oh = outer
+    ix, iy, iw, ih = inner
+    return ox <= ix and oy <= iy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+
+def crop(img, box):
+    x, y, w, h = box
+    if isinstance(img, np.ndarray):
+        return img[y:y + h, x:x + w]
+    return img.crop((x, y, x + w, y + h))
+
+
+def merge(results):
+    """
+    Stitch per-region WordTables into one page table: boxes shifted back into
+    page coordinates, one block per region in reading order.
+    """
+    return WordTable.concat([words.shifted(box[0], box[1], block_num=i + 1)
+                             for i, (box, words) in enumerate(results)])
+
+
+def plan(img, lang):
+    """
+    Analysis-plan step (see tesseract_driver.plan): one concurrent batch of
+    single-line passes, one per region. Empty when no text region is found.
+    """
+    boxes = find_regions(img)
+    if not boxes:
+        return WordTable()
+    tables = yield ("batch", [("data", crop(img, box), lang, LINE_PSM, None) for box in boxes])
+    return merge(list(zip(boxes, tables)))
+
+
+def map_concurrent(fn, requests):
+    """fn over requests on the region thread pool, results in order."""
+    return list(_get_executor().map(fn, requests))
@@ -1,26 +1,26 @@
 import pytesseract
-import pandas as pd
+from PIL import Image
 import io
+from ocr import engine_pool
+from ocr.wordtable import WordTable
 
 def run_tesseract_data(image_bytes, lang="eng", psm=6, oem=1):
     img = Image.open(io.BytesIO(image_bytes))
     # config: OEM 1 (LSTM), PSM choose 6/3/4 depending on card layout
-    config = f'--oem {oem} --psm {psm} -c tessedit_char_whitelist=0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ@.-,:/\\#'
-    # request TSV
-    tsv = pytesseract.image_to_data(img, lang=lang, config=config, output_type=pytesseract.Output.DATAFRAME)
-    # clean and aggregate by line_num
-    if isinstance(tsv, pd.DataFrame) and not tsv.empty:
-        # group by line
-        lines = []
-        confs = []
-        for line_no, g in tsv.groupby(['block_num','par_num','line_num'], sort=False):
-            text = " ".join([str(t).strip() for t in g['text'].tolist() if str(t).strip() != ''])
-            conf_vals = [c for c in g['conf'].tolist() if isinstance(c, (int, float)) and c >= 0]
-            mean_conf = float(np.mean(conf_vals)) if conf_vals else 0.0
-            lines.append(text)
-            confs.append(mean_conf)
+    whitelist = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ@.-,:/\\#'
+    config = f'--oem {oem} --psm {psm} -c tessedit_char_whitelist={whitelist}'
+    # request TSV text and parse it straight into a NumPy record array
+    if engine_pool.enabled():
+        tsv = engine_pool.image_to_tsv(img, lang=lang, psm=psm,
+                                       variables={"tessedit_char_whitelist": whitelist})
+    else:
+        tsv = pytesseract.image_to_data(img, lang=lang, config=config)
+    words = WordTable.from_tsv(tsv)
+    # aggregate by (block, par, line), vectorized
+    if len(words):
+        lines, confs = words.lines()
         raw = {
-            "tsv": tsv.to_dict(orient="list")
+            "tsv": words.to_dict()
         }
         return {"text": lines, "conf": confs, "raw": raw}
     else:
@@ -0,0 +1,118 @@
+import json
+import math
+import sys
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:   # numpy is optional for the serializer itself
+    np = None
+
+# Replacement for sanitize() + json.dumps(): one type-dispatched pass maps the
+# result to plain JSON-safe Python values, then the C json encoder writes it.
+# Lists made only of plain scalars ("lines", text columns) are checked with
+# set(map(type, ...)) and passed through without a copy; columns of a single
+# numpy scalar type (the tesseract "raw" dict) are converted with map().
+#
+#   NaN / inf / pd.NA / NaT / complex  -> null
+#   numpy scalars                      -> Python scalars
+#   numpy arrays, tuples, sets         -> lists
+#   Decimal                            -> float (null if non-finite)
+#   bytes / bytearray                  -> str (utf-8, invalid bytes replaced)
+#   anything else                      -> str(obj)
+
+_PLAIN = frozenset((str, int, bool, type(None)))
+_PLAIN_OR_FLOAT = _PLAIN | {float}
+
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def _float(f):
+    return f if math.isfinite(f) else None
+
+
+def _is_missing(obj):
+    # pandas missing markers without importing pandas ourselves
+    pd = sys.modules.get("pandas")
+    if pd is None:
+        return False
+    try:
+        return bool(pd.isna(obj))
+    except Exception:
+        return False
+
+
+def _floats(items):
+    if all(map(math.isfinite, (v for v in items if type(v) is float))):
+        return items
+    return [_float(v) if type(v) is float else v for v in items]
+
+
+def _list(items):
+    types = set(map(type, items))
+    if types <= _PLAIN:
+        return items
+    if types <= _PLAIN_OR_FLOAT:
+        return _floats(items)
+    if np is not None and len(types) == 1:
+        # a column of one numpy scalar type: convert it in one C-level pass
+        t = next(iter(types))
+        if issubclass(t, np.integer):
+            return list(map(int, items))
+        if issubclass(t, np.floating):
+            return _floats(list(map(float, items)))
+    return [clean(v) for v in items]
+
+
+def clean(obj):
+    """obj with every value mapped to its JSON-safe form (see the table above)."""
+    t = type(obj)
+    if t in _PLAIN:
+        return obj
+    if t is float:
+        return _float(obj)
+    if t is dict:
+        return {k if type(k) is str else str(k): clean(v) for k, v in obj.items()}
+    if t is list:
+        return _list(obj)
+    if t is tuple:
+        return _list(list(obj))
+    return _clean_other(obj)
+
+
+def _clean_other(obj):
+    # slower path for subclasses and non-builtin types
+    if isinstance(obj, str):
+        return str(obj)
+    if isinstance(obj, bool):
+        return bool(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    if isinstance(obj, float):
+        return _float(float(obj))
+    if isinstance(obj, dict):
+        return clean(dict(obj))
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return _list(list(obj))
+    if np is not None and isinstance(obj, np.generic):
+        return clean(obj.item())
+    if np is not None and isinstance(obj, np.ndarray):
+        return _list(obj.tolist())
+    if isinstance(obj, Decimal):
+        try:
+            return _float(float(obj))
+        except Exception:
+            return str(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).decode("utf-8", "replace")
+    if isinstance(obj, complex) or _is_missing(obj):
+        return None
+    try:
+        return str(obj)
+    except Exception:
+        return None
+
+
+def dumps(obj) -> bytes:
+    """Encode obj as compact JSON bytes, sanitizing values on the way."""
+    return _encoder.encode(clean(obj)).encode("utf-8")
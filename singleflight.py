@@ -0,0 +1,54 @@
+import asyncio
+
+from ocr import metrics
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller starts the
+    computation, later callers with the same key wait on that same task.
+
+    Every waiter applies its own timeout; the shared task is shielded so one
+    waiter timing out or disconnecting never cancels it for the others. Once
+    the last waiter has gone the task is cancelled, so abandoned work (and any
+    tesseract process it is running) stops instead of holding capacity; work
+    already running in a pool worker cannot be stopped, and the task holds its
+    admission slot until the worker is done (see RecognitionPool.run). A
+    cancelled task is forgotten at once, so a new caller starts afresh.
+    """
+
+    def __init__(self):
+        self._calls = {}     # key -> [task, number of waiters]
+        self.coalesced = metrics.Counter(
+            "ocr_singleflight_coalesced_total", "Requests that joined an identical in-flight recognition"
+        )
+
+    def in_flight(self):
+        return len(self._calls)
+
+    async def do(self, key, fn, timeout=None):
+        entry = self._calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(fn())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced.inc()
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+                if self._calls.get(key) is entry:
+                    del self._calls[key]
+
+    def _forget(self, key, task):
+        entry = self._calls.get(key)
+        if entry is not None and entry[0] is task:
+            del self._calls[key]
+        # mark the exception as retrieved even if every waiter already gave up
+        if not task.cancelled():
+            task.exception()
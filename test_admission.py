@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from ocr.admission import AdmissionController, Overloaded
+
+
+def test_batches_cannot_overfill_the_queue():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=2)
+        first = admission.reserve(3)
+        with pytest.raises(Overloaded):
+            admission.reserve(1)
+        with pytest.raises(Overloaded):
+            admission.check()
+
+        gate = asyncio.Event()
+
+        async def card(reservation):
+            with admission.holding(reservation):
+                async with admission.slot(bounded=False):
+                    await gate.wait()
+
+        tasks = [asyncio.ensure_future(card(r)) for r in first]
+        await asyncio.sleep(0)
+        assert (admission.active, admission.waiting, admission.reserved) == (1, 2, 0)
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert (admission.active, admission.waiting, admission.reserved) == (0, 0, 0)
+
+        # places of cards that never ran are given back
+        for r in admission.reserve(3):
+            admission.release(r)
+        assert admission.reserved == 0
+
+    asyncio.run(run())
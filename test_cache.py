@@ -0,0 +1,31 @@
+import os
+import time
+
+from ocr.cache import ResultCache
+
+
+def _entries(directory):
+    return sorted(name for _, _, files in os.walk(directory) for name in files)
+
+
+def test_disk_tier_is_pruned_by_size_and_age(tmp_path):
+    cache = ResultCache(max_bytes=0, directory=str(tmp_path), disk_max_bytes=250, max_age=3600)
+    for i in range(4):
+        cache.put(f"{i:02d}" * 32, b"x" * 100)
+    old = cache._path("00" * 32)
+    os.utime(old, (time.time() - 7200, time.time() - 7200))
+    # a read counts as use, so entry 01 outlives the never-read 02
+    os.utime(cache._path("01" * 32), (time.time() - 60, time.time() - 60))
+    os.utime(cache._path("02" * 32), (time.time() - 30, time.time() - 30))
+    assert cache.get("01" * 32) == b"x" * 100
+
+    cache.prune_disk()
+
+    assert _entries(tmp_path) == ["01" * 32 + ".json", "03" * 32 + ".json"]
+
+
+def test_peek_never_reads_disk(tmp_path):
+    cache = ResultCache(directory=str(tmp_path))
+    cache.put("ab" * 32, b"{}")
+    assert cache.peek("ab" * 32) == b"{}"
+    assert ResultCache(directory=str(tmp_path)).peek("ab" * 32) is None
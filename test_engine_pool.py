@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+from ocr import engine_pool, regions
+
+
+class _FakeAPI:
+    # stands in for tesserocr.PyTessBaseAPI; counts how many handles are built
+    created = 0
+
+    def __init__(self, **kwargs):
+        _FakeAPI.created += 1
+
+    def SetVariable(self, name, value):
+        pass
+
+    def SetImageBytes(self, *args):
+        pass
+
+    def Recognize(self):
+        # hold every handle of the batch at once, as concurrent crops do
+        _barrier.wait(5)
+
+    def GetTSVText(self, page):
+        return ""
+
+    def Clear(self):
+        pass
+
+    def End(self):
+        pass
+
+
+class _FakePSM:
+    AUTO = 3
+
+
+_barrier = threading.Barrier(regions.OCR_REGION_THREADS)
+
+
+def test_region_batches_reuse_handles(monkeypatch):
+    monkeypatch.setattr(engine_pool, "PyTessBaseAPI", _FakeAPI)
+    monkeypatch.setattr(engine_pool, "PSM", _FakePSM)
+    monkeypatch.setattr(engine_pool, "_pool", engine_pool.EnginePool(max_idle=1))
+    crops = [np.zeros((20, 100), np.uint8)] * regions.OCR_REGION_THREADS
+    line = lambda img: engine_pool.image_to_tsv(img, "eng", regions.LINE_PSM)
+
+    regions.map_concurrent(line, crops)
+    built = _FakeAPI.created
+    regions.map_concurrent(line, crops)
+
+    assert built == regions.OCR_REGION_THREADS
+    assert _FakeAPI.created == built
@@ -0,0 +1,30 @@
+import time
+
+from ocr.jobs import JobQueue, DONE, QUEUED, RUNNING
+
+
+def test_stale_attempt_cannot_touch_reclaimed_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=3, lease=0.05)
+    job_id = queue.submit(b"card")
+    first = queue.claim()
+    time.sleep(0.1)
+    second = queue.claim()    # the first attempt's lease expired
+    assert second["id"] == job_id
+
+    # the first drainer finishing late changes nothing
+    assert not queue.fail(job_id, first["started_at"], "late")
+    assert not queue.complete(job_id, first["started_at"], b"{}")
+    assert not queue.renew(job_id, first["started_at"])
+    assert queue.get(job_id)["status"] == RUNNING
+
+    assert queue.renew(job_id, second["started_at"])
+    assert queue.complete(job_id, second["started_at"], b"{}")
+    assert queue.get(job_id)["status"] == DONE
+
+
+def test_fail_requeues_current_attempt(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=3)
+    job_id = queue.submit(b"card")
+    job = queue.claim()
+    assert queue.fail(job_id, job["started_at"], "boom")
+    assert queue.get(job_id)["status"] == QUEUED
@@ -0,0 +1,50 @@
+import io
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from ocr.preprocess import find_card
+from ocr.warmup import synthetic_card
+
+
+def _card():
+    return np.array(Image.open(io.BytesIO(synthetic_card())).convert("L"))
+
+
+def _framed(fill=None):
+    # a tight scan with a logo box / photo panel drawn on it
+    img = Image.fromarray(_card())
+    ImageDraw.Draw(img).rectangle((600, 110, 990, 490), outline=0, width=4, fill=fill)
+    return np.array(img)
+
+
+def _on_desk(background):
+    # the card photographed at a slant on a plain desk
+    card = _card()
+    h, w = card.shape
+    corners = np.float32([[260, 240], [1330, 300], [1300, 930], [230, 880]])
+    M = cv2.getPerspectiveTransform(np.float32([[0, 0], [w, 0], [w, h], [0, h]]), corners)
+    warped = cv2.warpPerspective(card, M, (1600, 1200))
+    mask = cv2.warpPerspective(np.full_like(card, 255), M, (1600, 1200))
+    return np.where(mask > 127, warped, background).astype(np.uint8), corners
+
+
+def test_tight_scan_is_not_cropped():
+    assert find_card(_card()) is None
+
+
+def test_inner_frame_is_not_taken_for_the_card():
+    assert find_card(_framed()) is None
+
+
+def test_filled_panel_is_not_taken_for_the_card():
+    assert find_card(_framed(fill=40)) is None
+
+
+def test_card_on_desk_is_found():
+    for background in (60, 200):
+        img, corners = _on_desk(background)
+        quad = find_card(img)
+        assert quad is not None
+        assert np.abs(quad - corners).max() < 15
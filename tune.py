@@ -0,0 +1,268 @@
+"""
+Pick OMP thread limit x worker count x pool type (and, when tesseract runs
+from the event loop, cards in flight x tesseract children per card) for this
+host by measurement.
+
+    python -m ocr.tune [--corpus DIR] [--cards 40] [--max-p95 SECONDS]
+                       [--out ocr_config.json] [--dry-run]
+
+Every combination runs in a fresh interpreter (OMP_THREAD_LIMIT only takes
+effect before tesseract is loaded): a RecognitionPool with that many workers
+is warmed up, then the corpus is pushed through it the way the service
+serves it, recording throughput and p95 latency:
+
+    pool    (OCR_ASYNC_ENGINE off, or "auto" with tesserocr installed)
+            Recognize.extract in the pool, as many cards in flight as workers
+    async   (OCR_ASYNC_ENGINE on, or "auto" without tesserocr)
+            prepare in the pool, tesseract as asyncio subprocesses from the
+            event loop (ocr.async_driver), OCR_MAX_CONCURRENT cards in flight
+            with up to OCR_REGION_THREADS children each
+
+The CPU budget is the cgroup quota when one is set (containers), else the
+CPUs this process may run on.
+
+The winner is the highest throughput whose p95 is within --max-p95 (default:
+1.5x the best p95 seen). Its OCR_WORKERS / OCR_OMP_THREAD_LIMIT /
+OCR_POOL_TYPE / OCR_MAX_CONCURRENT (and OCR_REGION_THREADS for the async
+mode) are merged into the JSON config file the service reads (OCR_CONFIG),
+with OCR_ASYNC_ENGINE pinned to the mode that was measured.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+from ocr.config import OCR_CONFIG, OCR_LANGS
+
+
+def cgroup_cpus():
+    """CPUs allowed by the cgroup quota (v2 cpu.max or v1 cfs quota), or None if unlimited."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_budget():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpus()
+    if quota:
+        cpus = min(cpus, quota)
+    return max(1, int(round(cpus)))
+
+
+def _powers(limit):
+    n, out = 1, []
+    while n < limit:
+        out.append(n)
+        n *= 2
+    return out + [limit]
+
+
+def grid(cpus, pool_types, async_engine=False):
+    """
+    Settings to try (dicts of omp, workers, pool_type and, for the async
+    engine, concurrent and region_threads) that do not oversubscribe the
+    budget by more than 2x. With the async engine the tesseract children
+    (concurrent x region_threads) use the CPUs; the pool has one worker per
+    card in flight for preprocessing and field extraction.
+    """
+    combos = []
+    for pool_type in pool_types:
+        for workers in _powers(cpus):
+            for omp in _powers(cpus):
+                if not async_engine:
+                    if omp * workers <= 2 * cpus:
+                        combos.append({"omp": omp, "workers": workers, "pool_type": pool_type})
+                    continue
+                for region_threads in _powers(cpus):
+                    if omp * workers * region_threads <= 2 * cpus:
+                        combos.append({"omp": omp, "workers": workers, "pool_type": pool_type,
+                                       "concurrent": workers, "region_threads": region_threads})
+    return combos
+
+
+def describe(row):
+    text = f"omp={row['omp']:<3} workers={row['workers']:<3} {row['pool_type']:8s}"
+    if "concurrent" in row:
+        text += f" concurrent={row['concurrent']:<3} region_threads={row['region_threads']:<3}"
+    return text
+
+
+def load_corpus(directory, cards):
+    """Image bytes from directory (jpg/png/...), or synthetic cards when none is given."""
+    images = []
+    if directory:
+        for ext in ("*.jpg", "*.jpeg", "*.png", "*.tif", "*.tiff", "*.bmp", "*.webp"):
+            for path in sorted(glob.glob(os.path.join(directory, ext))):
+                with open(path, "rb") as f:
+                    images.append(f.read())
+    if not images:
+        from ocr.warmup import synthetic_card
+        images = [synthetic_card(1050 + 20 * (i % 5), 600 + 10 * (i % 3)) for i in range(5)]
+    return [images[i % len(images)] for i in range(cards)]
+
+
+async def _measure(workers, pool_type, images, lang, concurrent=None):
+    from ocr import async_driver
+    from ocr.workers import RecognitionPool
+    pool = RecognitionPool(workers, pool_type)
+    await pool.start()
+    if pool.warmup_error:
+        raise RuntimeError(pool.warmup_error)
+    slots = asyncio.Semaphore(concurrent or workers)
+    latencies = []
+
+    async def one(image):
+        async with slots:
+            start = time.perf_counter()
+            if concurrent:
+                # the service's async-engine path (Finalapp._recognize_async_engine)
+                pre = await pool.run("prepare", image)
+                analysis = await async_driver.analyze(pre, lang=lang)
+                await pool.extract(image, lang=lang, analysis=analysis)
+            else:
+                await pool.extract(image, lang=lang)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(img) for img in images))
+    finally:
+        pool.shutdown()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": len(images) / wall,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def run_one(args):
+    # child side: the parent already put OMP_THREAD_LIMIT in our environment
+    images = load_corpus(args.corpus, args.cards)
+    result = asyncio.run(_measure(args.workers, args.pool_type, images, args.lang, args.concurrent))
+    print(json.dumps(result))
+
+
+def trial(row, args):
+    omp = row["omp"]
+    env = dict(os.environ, OMP_THREAD_LIMIT=str(omp), OCR_OMP_THREAD_LIMIT=str(omp), OCR_WARMUP="1")
+    cmd = [sys.executable, "-m", "ocr.tune", "--run-one", "--workers", str(row["workers"]),
+           "--pool-type", row["pool_type"], "--cards", str(args.cards), "--lang", args.lang]
+    if "concurrent" in row:
+        env.update(OCR_ASYNC_ENGINE="1", OCR_REGION_THREADS=str(row["region_threads"]))
+        cmd += ["--concurrent", str(row["concurrent"])]
+    else:
+        env.update(OCR_ASYNC_ENGINE="0")
+    if args.corpus:
+        cmd += ["--corpus", args.corpus]
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "trial failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def choose(results, max_p95=None):
+    ok = [r for r in results if "error" not in r]
+    if not ok:
+        return None
+    limit = max_p95 if max_p95 else 1.5 * min(r["p95"] for r in ok)
+    within = [r for r in ok if r["p95"] <= limit] or ok
+    return max(within, key=lambda r: r["throughput"])
+
+
+def write_config(path, best):
+    config = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        pass
+    async_engine = "concurrent" in best
+    config.update({
+        "OCR_WORKERS": best["workers"],
+        "OCR_OMP_THREAD_LIMIT": best["omp"],
+        "OCR_POOL_TYPE": best["pool_type"],
+        "OCR_MAX_CONCURRENT": best["concurrent"] if async_engine else best["workers"],
+        # pinned: with "auto", installing tesserocr later would switch to a mode that was not measured
+        "OCR_ASYNC_ENGINE": "1" if async_engine else "0",
+    })
+    if async_engine:
+        config["OCR_REGION_THREADS"] = best["region_threads"]
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", help="directory of card images (default: synthetic cards)")
+    ap.add_argument("--cards", type=int, default=40, help="cards per trial")
+    ap.add_argument("--lang", default=OCR_LANGS[0] if OCR_LANGS else "eng")
+    ap.add_argument("--max-p95", type=float, help="seconds; default 1.5x the best p95")
+    ap.add_argument("--pool-types", default="process,thread")
+    ap.add_argument("--out", default=OCR_CONFIG)
+    ap.add_argument("--dry-run", action="store_true", help="report only, do not write the config")
+    # internal: one trial, run by the parent in a fresh interpreter
+    ap.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--workers", type=int, default=1, help=argparse.SUPPRESS)
+    ap.add_argument("--pool-type", default="process", help=argparse.SUPPRESS)
+    ap.add_argument("--concurrent", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_one:
+        run_one(args)
+        return
+
+    from ocr import async_driver
+    async_engine = async_driver.enabled()
+    cpus = cpu_budget()
+    pool_types = [p.strip() for p in args.pool_types.split(",") if p.strip()]
+    combos = grid(cpus, pool_types, async_engine)
+    print(f"CPU budget {cpus} (cgroup quota: {cgroup_cpus() or 'none'}), {'async' if async_engine else 'pool'} mode,"
+          f" {len(combos)} combinations, {args.cards} cards each")
+    results = []
+    for row in combos:
+        try:
+            row.update(trial(row, args))
+            print(f"{describe(row)} {row['throughput']:7.2f} cards/s  p50 {row['p50']:6.2f}s  p95 {row['p95']:6.2f}s")
+        except Exception as e:
+            row["error"] = str(e)
+            print(f"{describe(row)} failed: {e}")
+        results.append(row)
+
+    best = choose(results, args.max_p95)
+    if best is None:
+        print("no combination completed; config left unchanged")
+        sys.exit(1)
+    print(f"best: {describe(best)} ({best['throughput']:.2f} cards/s, p95 {best['p95']:.2f}s)")
+    if not args.dry_run:
+        write_config(args.out, best)
+        print(f"written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
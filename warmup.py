@@ -0,0 +1,46 @@
+import io
+
+from PIL import Image, ImageDraw, ImageFont
+
+# text for the synthetic card; exercises name/contact/address heuristics too
+_CARD_LINES = [
+    "Olivia Wilson",
+    "Marketing Manager",
+    "Borcelle Studio",
+    "+1 555 123 4567",
+    "hello@reallygreatsite.com",
+    "www.reallygreatsite.com",
+    "123 Anywhere St., Any City 12345",
+]
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)   # Pillow >= 10.1
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def synthetic_card(width=1050, height=600):
+    """PNG bytes of a plain business card, roughly the size of a phone scan."""
+    img = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    font = _font(40)
+    y = 40
+    for text in _CARD_LINES:
+        draw.text((60, y), text, fill=0, font=font)
+        y += 75
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+def warm_up(recognizer, langs):
+    """
+    Run the synthetic card through recognizer.extract once per language so
+    imports, traineddata loading and the first OSD call are paid before real
+    traffic arrives. Exceptions propagate to the caller.
+    """
+    card = synthetic_card()
+    for lang in langs:
+        recognizer.extract(card, lang=lang)
@@ -0,0 +1,165 @@
+import numpy as np
+
+# Tesseract TSV parsed straight into a NumPy record array: one row per TSV
+# row, numeric columns typed, word text kept in one string and addressed by
+# offsets. Line grouping and confidence means are computed on whole columns
+# instead of per-word int()/float() loops or a pandas groupby.
+
+NUM_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height", "conf")
+
+WORD_DTYPE = np.dtype([
+    ("level", np.int8), ("page_num", np.int16), ("block_num", np.int32),
+    ("par_num", np.int32), ("line_num", np.int32), ("word_num", np.int32),
+    ("left", np.int32), ("top", np.int32), ("width", np.int32), ("height", np.int32),
+    ("conf", np.float64), ("text_start", np.int32), ("text_end", np.int32),
+])
+
+
+class WordTable:
+    """
+    rec:  record array with WORD_DTYPE
+    text: all word texts (stripped) concatenated; row i is text[text_start:text_end]
+    """
+
+    def __init__(self, rec=None, text=""):
+        self.rec = np.zeros(0, WORD_DTYPE) if rec is None else rec
+        self.text = text
+
+    def __len__(self):
+        return len(self.rec)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows: TSV rows already split on tabs (at least the 11 numeric columns)."""
+        rows = [r for r in rows if len(r) >= 11]
+        n = len(rows)
+        rec = np.zeros(n, WORD_DTYPE)
+        if not n:
+            return cls(rec)
+        nums = np.array([r[:11] for r in rows], dtype=np.float64)
+        for i, name in enumerate(NUM_COLUMNS):
+            rec[name] = nums[:, i]
+        texts = [r[11].strip() if len(r) > 11 else "" for r in rows]
+        lengths = np.fromiter(map(len, texts), np.int32, n)
+        rec["text_end"] = np.cumsum(lengths)
+        rec["text_start"] = rec["text_end"] - lengths
+        return cls(rec, "".join(texts))
+
+    @classmethod
+    def from_tsv(cls, tsv):
+        """Parse tesseract TSV text (GetTSVText or image_to_data string output)."""
+        rows = [r.split("\t", 11) for r in tsv.splitlines() if r]
+        if rows and rows[0][0] == "level":
+            rows = rows[1:]
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_dict(cls, data):
+        """From the pytesseract Output.DICT layout."""
+        cols = [data.get(k, []) for k in NUM_COLUMNS]
+        texts = data.get("text", [])
+        return cls.from_rows([[*(c[i] for c in cols), str(texts[i])] for i in range(len(texts))])
+
+    @classmethod
+    def concat(cls, tables):
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls()
+        rec = np.concatenate([t.rec for t in tables])
+        # shift each table's text offsets past the text of the tables before it
+        shift = np.repeat(np.cumsum([0] + [len(t.text) for t in tables[:-1]]), [len(t) for t in tables])
+        rec["text_start"] += shift
+        rec["text_end"] += shift
+        return cls(rec, "".join(t.text for t in tables))
+
+    def words(self):
+        s, e, text = self.rec["text_start"].tolist(), self.rec["text_end"].tolist(), self.text
+        return [text[a:b] for a, b in zip(s, e)]
+
+    def has_text(self):
+        return self.rec["text_end"] > self.rec["text_start"]
+
+    def mean_conf(self):
+        """(mean confidence of recognised words, number of words)."""
+        conf = self.rec["conf"][self.has_text() & (self.rec["conf"] >= 0)]
+        return (float(conf.mean()) if len(conf) else 0.0), int(len(conf))
+
+    def _line_groups(self):
+        # rows with text, and the position in that array where each line starts
+        idx = np.flatnonzero(self.has_text())
+        if not len(idx):
+            return idx, idx
+        rec = self.rec[idx]
+        key = np.stack([rec["block_num"], rec["par_num"], rec["line_num"]], axis=1)
+        starts = np.flatnonzero(np.r_[True, (key[1:] != key[:-1]).any(axis=1)])
+        return idx, starts
+
+    def lines(self):
+        """
+        Words grouped into lines (rows sharing block/par/line, in TSV order).
+        Returns (texts, confs): confs[i] is the mean word confidence of line i.
+        """
+        idx, starts = self._line_groups()
+        if not len(idx):
+            return [], []
+        rec = self.rec[idx]
+        line_id = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(rec)]))
+
+        valid = rec["conf"] >= 0
+        total = np.bincount(line_id, weights=np.where(valid, rec["conf"], 0), minlength=len(starts))
+        count = np.bincount(line_id, weights=valid, minlength=len(starts))
+        confs = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+
+        text = self.text
+        words = [text[a:b] for a, b in zip(rec["text_start"].tolist(), rec["text_end"].tolist())]
+        bounds = np.r_[starts, len(rec)].tolist()
+        texts = [" ".join(words[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        return texts, confs.tolist()
+
+    def line_rows(self):
+        """Row indices of the words of each line, in the same order as lines()."""
+        idx, starts = self._line_groups()
+        return np.split(idx, starts[1:]) if len(idx) else []
+
+    def box(self, rows):
+        """(x, y, w, h) enclosing the given rows."""
+        rec = self.rec[rows]
+        x0, y0 = int(rec["left"].min()), int(rec["top"].min())
+        x1 = int((rec["left"] + rec["width"]).max())
+        y1 = int((rec["top"] + rec["height"]).max())
+        return x0, y0, x1 - x0, y1 - y0
+
+    def with_words(self, replacements):
+        """Copy with the text of some rows replaced; replacements: {row: text}."""
+        words = self.words()
+        for row, text in replacements.items():
+            words[row] = text.strip()
+        rec = self.rec.copy()
+        lengths = np.fromiter(map(len, words), np.int32, len(words))
+        rec["text_end"] = np.cumsum(lengths)
+        rec["text_start"] = rec["text_end"] - lengths
+        return WordTable(rec, "".join(words))
+
+    def shifted(self, dx, dy, block_num=None):
+        """Copy with boxes moved by (dx, dy), optionally all rows in one block."""
+        rec = self.rec.copy()
+        rec["left"] += dx
+        rec["top"] += dy
+        if block_num is not None:
+            rec["block_num"] = block_num
+        return WordTable(rec, self.text)
+
+    def to_dict(self):
+        """Columns as plain Python lists, same keys as pytesseract Output.DICT."""
+        out = {name: self.rec[name].tolist() for name in NUM_COLUMNS}
+        out["text"] = self.words()
+        return out
+
+    def to_tsv(self):
+        """Tesseract TSV text (with header row), e.g. to record a fixture."""
+        cols = [self.rec[name].tolist() for name in NUM_COLUMNS]
+        rows = ["\t".join(NUM_COLUMNS + ("text",))]
+        for *nums, text in zip(*cols, self.words()):
+            rows.append("\t".join([*(str(v) for v in nums[:-1]), f"{nums[-1]:g}", text]))
+        return "\n".join(rows) + "\n"
@@ -0,0 +1,166 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from ocr.config import OCR_WORKERS, OCR_LANGS, OCR_WARMUP, OCR_POOL_TYPE
+from ocr import metrics
+
+# one warm Recognize instance per worker process, created by the pool initializer
+_recognizer = None
+# set when warm-up failed in this worker; reported through _ping
+_warmup_error = None
+# shared with the parent so start() can hold one ping per worker process
+_start_barrier = None
+
+
+def _init_worker(barrier=None):
+    # runs once in each worker as the executor spawns it. A worker that dies is
+    # never replaced: the whole ProcessPoolExecutor breaks, and
+    # RecognitionPool.run swaps in a new one (see _restart)
+    global _recognizer, _warmup_error, _start_barrier
+    _start_barrier = barrier
+    try:
+        from ocr.recognition import Recognize
+        # in a thread pool every thread runs this; one Recognize is shared (it is stateless)
+        if _recognizer is None:
+            _recognizer = Recognize()
+        if OCR_WARMUP:
+            from ocr.warmup import warm_up
+            with metrics.collect():   # keep synthetic-card timings out of the stats
+                warm_up(_recognizer, OCR_LANGS)
+    except Exception:
+        # an initializer exception would break the whole pool; report it instead
+        _warmup_error = traceback.format_exc(limit=3)
+
+
+def _ping(timeout):
+    # wait until every worker holds a ping, so each process answers exactly once
+    try:
+        _start_barrier.wait(timeout)
+    except Exception:
+        return os.getpid(), _warmup_error or "worker start timed out"
+    return os.getpid(), _warmup_error
+
+
+def _call(method, image_bytes, kwargs):
+    # runs inside the worker process; stage timings travel back with the result
+    with metrics.collect() as samples:
+        result = getattr(_recognizer, method)(image_bytes, **kwargs)
+    return result, samples
+
+
+class RecognitionPool:
+    """
+    Runs Recognize.extract / Recognize.recognize in a pool of worker processes
+    (or threads, pool_type="thread") so preprocessing, OSD and tesseract never
+    block the event loop. The executor is created lazily on first use.
+
+    If a worker process dies (segfault, OOM kill) the executor is broken for
+    good; the request that finds it so fails, and the pool drops it, clears
+    ready and warms up a fresh executor in the background.
+    """
+
+    def __init__(self, workers: int = None, pool_type: str = None):
+        self.workers = max(1, int(workers or OCR_WORKERS))
+        self.pool_type = (pool_type or OCR_POOL_TYPE).lower()
+        if self.pool_type not in ("process", "thread"):
+            raise ValueError(f"unknown pool type {self.pool_type!r}")
+        self._executor = None
+        self._lock = threading.Lock()
+        self.ready = False
+        self.warmup_error = None
+        self._restarting = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None and self.pool_type == "thread":
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="ocr-worker",
+                        initializer=_init_worker, initargs=(threading.Barrier(self.workers),)
+                    )
+                elif self._executor is None:
+                    ctx = multiprocessing.get_context()
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=ctx,
+                        initializer=_init_worker, initargs=(ctx.Barrier(self.workers),)
+                    )
+        return self._executor
+
+    async def run(self, method, image_bytes, **kwargs):
+        fn = partial(_call, method, image_bytes, kwargs)
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn)
+            waiter = asyncio.wrap_future(future)
+            try:
+                result, samples = await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                if not future.cancel():
+                    # a worker cannot be interrupted: stay until it is free, so
+                    # the caller's admission slot is not handed out while it runs
+                    try:
+                        await waiter
+                    except Exception:
+                        pass
+                raise
+        except BrokenProcessPool as e:
+            self._restart(executor)
+            raise RuntimeError("a recognition worker died; the pool is restarting") from e
+        metrics.replay(samples)
+        return result
+
+    def _restart(self, broken):
+        # every request in flight on the broken executor lands here; the first one rebuilds
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self.ready = False
+            self.warmup_error = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        metrics.POOL_RESTARTS.inc()
+        self._restarting = asyncio.ensure_future(self._rewarm())
+
+    async def _rewarm(self):
+        try:
+            await self.start()
+        except Exception as e:
+            self.warmup_error = str(e)
+
+    async def start(self, timeout: float = 600.0):
+        """
+        Spawn every worker and wait until each has finished its warm-up.
+        One ping per worker is submitted; the pings block on a shared barrier,
+        so each lands on a different worker and only returns once all of
+        them have run their initializer.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        results = await asyncio.gather(
+            *[loop.run_in_executor(executor, _ping, timeout) for _ in range(self.workers)]
+        )
+        errors = [err for _, err in results if err]
+        self.warmup_error = errors[0] if errors else None
+        self.ready = not errors
+        return results
+
+    async def extract(self, image_bytes, lang="eng", **kwargs):
+        return await self.run("extract", image_bytes, lang=lang, **kwargs)
+
+    async def recognize(self, image_bytes, lang="eng", **kwargs):
+        return await self.run("recognize", image_bytes, lang=lang, **kwargs)
+
+    def shutdown(self, wait=True):
+        if self._restarting is not None:
+            self._restarting.cancel()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+            self.ready = False